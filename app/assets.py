@@ -0,0 +1,65 @@
+"""
+Static assets of the app header. Stdlib only, so the header renders before the geo
+and plotting stacks are imported.
+"""
+
+from functools import lru_cache
+import json
+from pathlib import Path
+import threading
+from typing import Dict, Optional
+import urllib.request
+
+
+LOTTIE_URL = "https://assets10.lottiefiles.com/temp/lf20_YQB3X3.json"
+LOTTIE_PATH = Path(__file__).parent / "static" / "lottie.json"
+
+_download_lock = threading.Lock()
+
+
+def _download(url: str, path: Path, timeout: float) -> None:
+    if not _download_lock.acquire(blocking=False):
+        return
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            content = response.read()
+        json.loads(content)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        _read_json.cache_clear()
+    except (OSError, ValueError):
+        pass
+    finally:
+        _download_lock.release()
+
+
+@lru_cache(maxsize=None)
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def load_lottie(
+    url: str = LOTTIE_URL, path: Path = LOTTIE_PATH, timeout: float = 5.0
+) -> Optional[Dict]:
+    """
+    Loads the Lottie animation from the bundled/cached file, never blocks on the
+    network. If the file does not exist yet, it is downloaded in the background and
+    the animation shows from the next rerun on.
+
+    Args:
+        url: Download location of the animation.
+        path: Local file of the animation.
+        timeout: Timeout of the background download in seconds.
+
+    Returns:
+        The animation json, or None if it is not available locally yet.
+    """
+    lottie_json = _read_json(path)
+    if lottie_json is None:
+        threading.Thread(
+            target=_download, args=(url, path, timeout), daemon=True
+        ).start()
+    return lottie_json
@@ -0,0 +1,432 @@
+"""
+Content-addressed cache for the parsed input, the validation results and the fixed
+geometries. Streamlit reruns the app script on every interaction, the imported
+modules and thus the cache persist across reruns and sessions.
+
+When the input is edited, the results of the previous run are reused for the
+unchanged features, matched by per-feature hashes.
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame
+from shapely.geometry.base import BaseGeometry
+
+import fixes
+import utils
+from validation import (
+    Vector,
+    VALIDATION_CRITERIA,
+    ADDITIONAL_VALIDATION_CRITERIA,
+    INTER_FEATURE_CRITERIA,
+    check_no_overlaps,
+    run_feature_checks,
+)
+
+
+def hash_input(data: bytes, name: str = "") -> str:
+    """
+    Hash of the input bytes, the name is included as e.g. the file suffix determines
+    how the input is parsed.
+    """
+    return hashlib.sha256(name.encode() + b"\0" + data).hexdigest()
+
+
+def hash_features(df: GeoDataFrame) -> np.ndarray:
+    """
+    64 bit hash per feature of its geometry and properties, independent of the
+    position of the feature.
+    """
+    hashed = df.drop(columns=df.geometry.name)
+    for column in hashed.columns[hashed.dtypes == object]:
+        # Parsed JSON properties can be lists or dicts, which are not hashable.
+        hashed[column] = hashed[column].astype(str)
+    hashed["__wkb"] = shapely.to_wkb(np.asarray(df.geometry.values))
+    return pd.util.hash_pandas_object(hashed, index=False).to_numpy()
+
+
+def match_features(hashes: np.ndarray, previous_hashes: np.ndarray) -> np.ndarray:
+    """
+    Position of each feature in the previous run, -1 for added or changed features.
+    """
+    # Identical features have the same hash, these match the first of them.
+    unique_hashes, first = np.unique(previous_hashes, return_index=True)
+    match = pd.Index(unique_hashes).get_indexer(hashes)
+    return np.where(match >= 0, first[match], -1)
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Approximate memory size in bytes of the cached objects.
+    """
+    if isinstance(obj, GeoDataFrame):
+        geometries = np.asarray(obj.geometry.values)
+        coordinates = shapely.get_num_coordinates(geometries).sum()
+        properties = obj.drop(columns=obj.geometry.name).memory_usage(deep=True)
+        return int(coordinates * 16 + len(geometries) * 100 + properties.sum())
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(estimate_size(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache, bounded by the estimated size of the
+    entries.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value or computes, caches and returns it.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+CACHE = LRUCache(
+    max_bytes=int(os.environ.get("VECTOR_VALIDATOR_CACHE_MB", 256)) * 1024**2
+)
+
+
+def feature_hashes(df: GeoDataFrame, input_hash: str) -> np.ndarray:
+    """
+    The per-feature hashes of the parsed input, cached by input.
+    """
+    return CACHE.get_or_compute(("hashes", input_hash), lambda: hash_features(df))
+
+
+def run_record(
+    vector: Vector, input_hash: str, validation_criteria: List[str]
+) -> Dict[str, Any]:
+    """
+    Results of a run that are reused for the unchanged features of the next run, the
+    per-feature checks of the input and the repaired geometries by feature hash.
+    """
+    return {
+        "hashes": feature_hashes(vector.df, input_hash),
+        "crs": vector.df.crs,
+        "feature_checks": vector.feature_checks,
+        "criteria": tuple(sorted(validation_criteria)),
+        "repairs": {},
+    }
+
+
+def check_features(
+    df: GeoDataFrame,
+    input_hash: str,
+    previous_run: Optional[Dict[str, Any]] = None,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int, Dict[str, np.ndarray]], None]] = None,
+    gap_area: float = 0.0,
+    inter_feature: bool = True,
+) -> Dict[str, np.ndarray]:
+    """
+    Runs the per-feature checks, see run_feature_checks.
+
+    Args:
+        df: The parsed input.
+        input_hash: Hash of the input.
+        previous_run: Record of the previous run (see run_record), only the added or
+            changed features are checked again.
+        chunk_size: Check the features in chunks of this many features.
+        on_chunk: Called after each chunk with the number of checked features, the
+            number of features to check and the checks so far, unchecked features
+            are valid. The inter-feature checks are run after the last chunk.
+        gap_area: Gap area of the "No Overlaps" check, see run_feature_checks.
+        inter_feature: Also run the checks of INTER_FEATURE_CRITERIA.
+
+    Returns:
+        Per validation criteria a boolean array, True for the valid features.
+    """
+    geometries = np.asarray(df.geometry.values)
+    if (
+        previous_run is not None
+        and len(previous_run["hashes"])
+        and previous_run["crs"] == df.crs
+    ):
+        position = match_features(
+            feature_hashes(df, input_hash), previous_run["hashes"]
+        )
+        is_unchanged = position >= 0
+        feature_checks = {
+            criteria: np.where(is_unchanged, is_valid[position], True)
+            for criteria, is_valid in previous_run["feature_checks"].items()
+            if criteria not in INTER_FEATURE_CRITERIA
+        }
+        index = np.flatnonzero(~is_unchanged)
+    else:
+        feature_checks = {
+            criteria: np.ones(len(geometries), dtype=bool)
+            for criteria in VALIDATION_CRITERIA + ADDITIONAL_VALIDATION_CRITERIA
+            if criteria not in INTER_FEATURE_CRITERIA
+        }
+        index = np.arange(len(geometries))
+
+    chunk_size = chunk_size or max(len(index), 1)
+    for start in range(0, len(index), chunk_size):
+        chunk = index[start : start + chunk_size]
+        checks = run_feature_checks(
+            geometries[chunk], inter_feature=False, crs=df.crs
+        )
+        for criteria, is_valid in checks.items():
+            feature_checks[criteria][chunk] = is_valid
+        if on_chunk is not None:
+            on_chunk(start + len(chunk), len(index), feature_checks)
+    if inter_feature:
+        feature_checks["No Overlaps"] = check_no_overlaps(
+            geometries, gap_area, feature_checks["No Self-Intersection"]
+        )
+    return feature_checks
+
+
+def validate(
+    df: GeoDataFrame,
+    validation_criteria: List[str],
+    input_hash: str,
+    previous_run: Optional[Dict[str, Any]] = None,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int, Dict[str, np.ndarray]], None]] = None,
+    gap_area: float = 0.0,
+) -> Vector:
+    """
+    Validation of the parsed input, the per-feature checks are cached by input.
+
+    Args:
+        df: The parsed input.
+        validation_criteria: The list of selected validation criteria.
+        input_hash: Hash of the input.
+        previous_run: Record of the previous run (see run_record), only the added or
+            changed features are checked again.
+        chunk_size: Check the features in chunks, see check_features.
+        on_chunk: Progress callback per chunk, see check_features.
+        gap_area: Gap area of the "No Overlaps" check, see run_feature_checks.
+
+    Returns:
+        The validated vector.
+    """
+    vector = Vector(df, gap_area=gap_area)
+    # The inter-feature checks cover all features, only run if selected.
+    inter_feature = "No Overlaps" in validation_criteria
+    feature_checks = CACHE.get_or_compute(
+        ("checks", input_hash, gap_area, inter_feature),
+        lambda: check_features(
+            df, input_hash, previous_run, chunk_size, on_chunk, gap_area, inter_feature
+        ),
+    )
+    vector.evaluate_feature_checks(feature_checks, validation_criteria)
+    return vector
+
+
+def fix(
+    vector: Vector,
+    validation_criteria: List[str],
+    input_hash: str,
+    previous_run: Optional[Dict[str, Any]] = None,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[Vector, List[str], Dict[int, BaseGeometry]]:
+    """
+    Fixes and re-validates a copy of the vector, cached by input and criteria.
+
+    Args:
+        vector: The validated vector.
+        validation_criteria: The list of selected validation criteria.
+        input_hash: Hash of the input.
+        previous_run: Record of the previous run (see run_record), the repairs of
+            the unchanged features are reused if the criteria are the same.
+        chunk_size: Repair the features in chunks, see fixes.fix.
+        on_chunk: Progress callback per chunk, see fixes.fix.
+
+    Returns:
+        The fixed vector, the descriptions of the applied fixes and the repaired
+        geometries by feature hash.
+    """
+    criteria_key = tuple(sorted(validation_criteria))
+
+    def compute():
+        fixed = Vector(vector.df.copy(), gap_area=vector.gap_area)
+        fixed.evaluate_feature_checks(vector.feature_checks, validation_criteria)
+        hashes = feature_hashes(vector.df, input_hash).tolist()
+        known_repairs = {}
+        if (
+            previous_run is not None
+            and previous_run["criteria"] == criteria_key
+            and previous_run["crs"] == vector.df.crs
+        ):
+            repairs = previous_run["repairs"]
+            known_repairs = {
+                i: repairs[h] for i, h in enumerate(hashes) if h in repairs
+            }
+        applied = fixes.fix(
+            fixed,
+            validation_criteria,
+            known_repairs=known_repairs,
+            chunk_size=chunk_size,
+            on_chunk=on_chunk,
+        )
+        repairs = {hashes[i]: geometry for i, geometry in known_repairs.items()}
+        return fixed.df, fixed.feature_checks, applied, repairs
+
+    df, feature_checks, applied, repairs = CACHE.get_or_compute(
+        ("fix", input_hash, criteria_key, vector.gap_area), compute
+    )
+    fixed = Vector(df, gap_area=vector.gap_area)
+    fixed.evaluate_feature_checks(feature_checks, validation_criteria)
+    return fixed, applied, repairs
+
+
+def serialize(
+    df: GeoDataFrame,
+    output_format: str,
+    input_hash: str,
+    validation_criteria: List[str],
+    precision: Optional[int] = None,
+    rfc7946: bool = False,
+    gap_area: float = 0.0,
+) -> bytes:
+    """
+    The output file content, serialized once per input, criteria, gap area and
+    output options.
+    """
+    return CACHE.get_or_compute(
+        (
+            "output",
+            input_hash,
+            tuple(sorted(validation_criteria)),
+            gap_area,
+            output_format,
+            precision,
+            rfc7946,
+        ),
+        lambda: utils.write_df_to_bytes(df, output_format, precision, rfc7946),
+    )
+
+
+def report(
+    vector: Vector, input_hash: str, validation_criteria: List[str]
+) -> pd.DataFrame:
+    """
+    The feature report of the validated input, cached by input, criteria and gap
+    area.
+    """
+    return CACHE.get_or_compute(
+        ("report", input_hash, tuple(sorted(validation_criteria)), vector.gap_area),
+        lambda: vector.feature_report(validation_criteria),
+    )
+
+
+def serialize_report(
+    report_df: pd.DataFrame,
+    output_format: str,
+    input_hash: str,
+    validation_criteria: List[str],
+    gap_area: float = 0.0,
+) -> bytes:
+    """
+    The feature report file content, serialized once per input, criteria, gap area
+    and format.
+    """
+    return CACHE.get_or_compute(
+        (
+            "report_output",
+            input_hash,
+            tuple(sorted(validation_criteria)),
+            gap_area,
+            output_format,
+        ),
+        lambda: utils.write_report_to_bytes(report_df, output_format),
+    )
+
+
+def output_sizes(
+    df: GeoDataFrame,
+    fixed_df: GeoDataFrame,
+    input_hash: str,
+    validation_criteria: List[str],
+    gap_area: float = 0.0,
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Number of vertices and GeoJSON size in bytes of the input and the fixed output,
+    the output GeoJSON is shared with its download.
+    """
+
+    def compute():
+        before = {
+            "vertices": int(
+                shapely.get_num_coordinates(np.asarray(df.geometry.values)).sum()
+            ),
+            "bytes": len(utils.write_df_to_bytes(df, "GeoJSON")),
+        }
+        after = {
+            "vertices": int(
+                shapely.get_num_coordinates(np.asarray(fixed_df.geometry.values)).sum()
+            ),
+            "bytes": len(
+                serialize(
+                    fixed_df,
+                    "GeoJSON",
+                    input_hash,
+                    validation_criteria,
+                    gap_area=gap_area,
+                )
+            ),
+        }
+        return before, after
+
+    return CACHE.get_or_compute(
+        ("sizes", input_hash, tuple(sorted(validation_criteria)), gap_area), compute
+    )
@@ -0,0 +1,356 @@
+"""
+Headless batch validation and fixing of many vector files, without the app.
+
+Example:
+    python app/cli.py data/*.geojson data/*.zip --output-dir fixed --workers 8
+"""
+
+import argparse
+from collections import Counter
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import fixes
+import utils
+from validation import Vector, VALIDATION_CRITERIA, ADDITIONAL_VALIDATION_CRITERIA
+
+
+def output_paths(paths: List[Path], output_dir: Path) -> List[Path]:
+    """
+    Unique output GeoJSON paths of the input files. The directories of the inputs
+    below their common parent are mirrored, inputs with the same stem in the same
+    directory keep their suffix in the name, e.g. roads.zip.geojson.
+
+    Raises:
+        ValueError: An input file is given more than once.
+    """
+    resolved = [path.resolve() for path in paths]
+    common = Path(os.path.commonpath([path.parent for path in resolved]))
+    relative = [path.relative_to(common) for path in resolved]
+    stems = Counter(path.with_suffix("") for path in relative)
+    outputs = [
+        output_dir / path.with_suffix(".geojson")
+        if stems[path.with_suffix("")] == 1
+        else output_dir / f"{path}.geojson"
+        for path in relative
+    ]
+    counts = Counter(outputs)
+    duplicates = sorted(
+        {str(path) for path, output in zip(paths, outputs) if counts[output] > 1}
+    )
+    if duplicates:
+        raise ValueError(f"Input files given more than once: {duplicates}")
+    return outputs
+
+
+def _partial_file(output_file: Path) -> Path:
+    return output_file.with_name(f"{output_file.name}.part")
+
+
+def process_file(
+    path: Path,
+    output_file: Path,
+    validation_criteria: List[str],
+    chunk_size: Optional[int] = None,
+    precision: Optional[int] = None,
+    rfc7946: bool = False,
+    gap_area: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Validates and fixes a single vector file and writes the fixed GeoJSON.
+
+    Args:
+        path: The input vector file, any format supported by read_vector_file_to_df.
+        output_file: Path the fixed GeoJSON is written to, see output_paths.
+        validation_criteria: The list of validation criteria to check and fix.
+        chunk_size: If given, the file is streamed in chunks of this many features,
+            each chunk is validated, fixed and written before the next is read. The
+            summary is aggregated across all chunks.
+        precision: Number of decimals of the output coordinates, None keeps all.
+        rfc7946: Write RFC 7946 compliant GeoJSON.
+        gap_area: Gaps between features smaller than this area fail the "No
+            Overlaps" check as well and are filled, 0 only checks the overlaps.
+
+    Returns:
+        The summary of the file.
+
+    Raises:
+        ValueError: chunk_size is combined with "No Overlaps", overlaps between the
+            chunks would not be detected.
+    """
+    if chunk_size and "No Overlaps" in validation_criteria:
+        raise ValueError("No Overlaps can not be checked in chunks!")
+    if chunk_size:
+        chunks = utils.read_vector_file_in_chunks(path, chunk_size)
+    else:
+        with open(path, "rb") as f:
+            chunks = [utils.read_vector_file_to_df(f)]
+
+    summary = {
+        "features": 0,
+        "valid_before": True,
+        "invalid_features_before": {criteria: 0 for criteria in validation_criteria},
+        "fixes": [],
+        "valid": True,
+        "valid_all": True,
+    }
+    # Only completely valid results are kept, the partial file is removed otherwise.
+    partial_file = _partial_file(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(partial_file, "wb") as out:
+        out.write(b'{"type":"FeatureCollection","features":[')
+        separator = b""
+        for df in chunks:
+            vector = Vector(df)
+            vector.run_validation_checks(validation_criteria, gap_area=gap_area)
+            summary["features"] += int(df.shape[0])
+            summary["valid_before"] &= vector.valid_by_citeria
+            for criteria in validation_criteria:
+                summary["invalid_features_before"][criteria] += int(
+                    (~vector.feature_checks[criteria]).sum()
+                )
+            if not vector.valid_by_citeria:
+                # Files are processed in parallel, each repair stays in its worker.
+                for message in fixes.fix(vector, validation_criteria, workers=1):
+                    if message not in summary["fixes"]:
+                        summary["fixes"].append(message)
+            summary["valid"] &= vector.valid_by_citeria
+            summary["valid_all"] &= vector.valid_all
+
+            if summary["valid"]:
+                for features in utils.iter_geojson_features(
+                    vector.df, precision, rfc7946
+                ):
+                    out.write(separator + features)
+                    separator = b","
+        out.write(b"]}")
+
+    if summary["valid"]:
+        partial_file.replace(output_file)
+        summary["status"] = "ok"
+        summary["output"] = str(output_file)
+    else:
+        partial_file.unlink()
+        summary["status"] = "invalid"
+    return summary
+
+
+def _worker(
+    connection,
+    path: Path,
+    output_file: Path,
+    validation_criteria: List[str],
+    chunk_size: Optional[int],
+    precision: Optional[int],
+    rfc7946: bool,
+    gap_area: float,
+) -> None:
+    try:
+        result = process_file(
+            path,
+            output_file,
+            validation_criteria,
+            chunk_size,
+            precision,
+            rfc7946,
+            gap_area,
+        )
+    except Exception as e:
+        result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    connection.send(result)
+    connection.close()
+
+
+def run_batch(
+    paths: List[Path],
+    output_dir: Path,
+    summary_file: Path,
+    validation_criteria: List[str],
+    workers: int,
+    timeout: float,
+    chunk_size: Optional[int] = None,
+    precision: Optional[int] = None,
+    rfc7946: bool = False,
+    gap_area: float = 0.0,
+) -> Dict[str, int]:
+    """
+    Processes the files in parallel, each in its own worker process so that a file
+    exceeding the timeout can be terminated without stalling the batch. A summary
+    line (JSON) is appended to the summary file as soon as each file finishes.
+
+    Returns:
+        The number of files per status.
+
+    Raises:
+        ValueError: An input file is given more than once.
+    """
+    pending = list(reversed(list(zip(paths, output_paths(paths, output_dir)))))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    running = {}  # connection -> (process, path, output file, start time)
+    counts: Dict[str, int] = {}
+
+    with open(summary_file, "w") as summary:
+        while pending or running:
+            while pending and len(running) < workers:
+                path, output_file = pending.pop()
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(
+                    target=_worker,
+                    args=(
+                        sender,
+                        path,
+                        output_file,
+                        validation_criteria,
+                        chunk_size,
+                        precision,
+                        rfc7946,
+                        gap_area,
+                    ),
+                    daemon=True,
+                )
+                process.start()
+                sender.close()
+                running[receiver] = (process, path, output_file, time.monotonic())
+
+            next_deadline = min(start for *_, start in running.values()) + timeout
+            ready = wait(
+                list(running), timeout=max(0.0, next_deadline - time.monotonic())
+            )
+
+            finished = []
+            for connection in ready:
+                process, *_ = running[connection]
+                try:
+                    result = connection.recv()
+                except EOFError:
+                    process.join()
+                    result = {
+                        "status": "error",
+                        "error": f"Worker exited with code {process.exitcode}",
+                    }
+                finished.append((connection, result))
+            now = time.monotonic()
+            for connection, (process, *_, start) in running.items():
+                if connection not in ready and now - start > timeout:
+                    process.terminate()
+                    result = {"status": "timeout", "error": f"Exceeded {timeout}s"}
+                    finished.append((connection, result))
+
+            for connection, result in finished:
+                process, path, output_file, start = running.pop(connection)
+                process.join()
+                connection.close()
+                if result["status"] in ("timeout", "error"):
+                    # Left behind by terminated or failed workers.
+                    _partial_file(output_file).unlink(missing_ok=True)
+                result = {
+                    "file": str(path),
+                    **result,
+                    "seconds": round(time.monotonic() - start, 3),
+                }
+                summary.write(json.dumps(result) + "\n")
+                summary.flush()
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Validates and fixes vector files (GeoJSON/JSON, KML, WKT, "
+        "zipped SHAPEFILE, FlatGeobuf, GeoParquet, Arrow) in parallel."
+    )
+    parser.add_argument("files", nargs="+", type=Path, help="The input vector files.")
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path("fixed"),
+        help="Directory for the fixed GeoJSON files.",
+    )
+    parser.add_argument(
+        "--summary",
+        type=Path,
+        default=None,
+        help="JSON lines summary file, one line per input file. Defaults to "
+        "summary.jsonl in the output directory.",
+    )
+    parser.add_argument(
+        "--criteria",
+        nargs="+",
+        choices=VALIDATION_CRITERIA + ADDITIONAL_VALIDATION_CRITERIA,
+        default=VALIDATION_CRITERIA,
+        help="The validation criteria to check and fix.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of parallel worker processes.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=300,
+        help="Maximum seconds per file before its worker is terminated.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Stream each file in chunks of this many features, for files larger "
+        "than memory. Not possible with No Overlaps. By default files are read "
+        "completely.",
+    )
+    parser.add_argument(
+        "--precision",
+        type=int,
+        default=None,
+        help="Number of decimals of the output coordinates. By default all are kept.",
+    )
+    parser.add_argument(
+        "--rfc7946",
+        action="store_true",
+        help="Write RFC 7946 compliant GeoJSON, reprojected to EPSG:4326 with "
+        "counterclockwise exterior rings.",
+    )
+    parser.add_argument(
+        "--gap-area",
+        type=float,
+        default=0.0,
+        help="Gaps between features smaller than this area (in squared units of "
+        "the crs) fail the No Overlaps check as well and are filled. By default "
+        "only overlaps are checked.",
+    )
+    args = parser.parse_args()
+
+    if args.chunk_size and "No Overlaps" in args.criteria:
+        parser.error(
+            "--chunk-size can not be combined with No Overlaps, overlaps between "
+            "the chunks would not be detected."
+        )
+    try:
+        output_paths(args.files, args.output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    counts = run_batch(
+        paths=args.files,
+        output_dir=args.output_dir,
+        summary_file=args.summary or args.output_dir / "summary.jsonl",
+        validation_criteria=args.criteria,
+        workers=max(1, args.workers),
+        timeout=args.timeout,
+        chunk_size=args.chunk_size,
+        precision=args.precision,
+        rfc7946=args.rfc7946,
+        gap_area=args.gap_area,
+    )
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
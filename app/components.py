@@ -2,34 +2,81 @@
 Contains the visual elements of the app.
 """
 
-from typing import List, Union
-import json
+from functools import lru_cache
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import geojson
+import numpy as np
+import pandas as pd
+import shapely
 import streamlit as st
-from shapely.geometry.polygon import orient
 from geopandas import GeoDataFrame
-import pandas_bokeh
-
-pandas_bokeh.output_notebook()
 
+import cache
+import fixes
+import jobs
 import utils
-from validation import Vector
+from instrumentation import Profiler
+from validation import (
+    Vector,
+    ADDITIONAL_VALIDATION_CRITERIA,
+    LARGE_GEOMETRY_VERTICES,
+    VALIDATION_CRITERIA,
+    find_large_geometries,
+)
 
 
-FILETYPES = ["geojson", "json", "kml", "wkt", "zip"]
-FILETYPES_SHAPEFILE = ["shp", "shx", "dbf", "prj"]
-VALIDATION_CRITERIA = [
-    "No Self-Intersection",
-    "No Holes",
-    "Counterclockwise",
+FILETYPES = [
+    "geojson",
+    "json",
+    "kml",
+    "wkt",
+    "zip",
+    "fgb",
+    "parquet",
+    "geoparquet",
+    "arrow",
+    "feather",
+    "ipc",
 ]
-ADDITIONAL_VALIDATION_CRITERIA = ["No Duplicated Vertices"]
+FILETYPES_SHAPEFILE = ["shp", "shx", "dbf", "prj"]
+# Map size in pixels, and the feature limits above which the map shows centroids
+# and a random sample of the centroids.
+MAP_SIZE = (400, 250)
+MAP_MAX_FEATURES = 5_000
+MAP_MAX_POINTS = 50_000
+# Features per page and coordinates per ring shown in the GeoJSON preview.
+PREVIEW_PAGE_SIZE = 10
+PREVIEW_MAX_COORDINATES = 50
+# Output format: (file extension, mime type)
+OUTPUT_FORMATS = {
+    "GeoJSON": ("geojson", "application/geo+json"),
+    "GeoJSON (gzip)": ("geojson.gz", "application/gzip"),
+    "GeoParquet": ("parquet", "application/vnd.apache.parquet"),
+    "FlatGeobuf": ("fgb", "application/octet-stream"),
+}
+# Coordinate decimals of the GeoJSON output, None keeps all.
+OUTPUT_PRECISIONS = [None, 9, 8, 7, 6, 5, 4]
+# Inputs of at least this many features are checked and fixed in a background job,
+# the progress is polled in this interval in seconds.
+JOB_MIN_FEATURES = 20_000
+JOB_POLL_SECONDS = 0.5
+# Rows per page of the feature report, report format: (file extension, mime type)
+REPORT_PAGE_SIZE = 20
+REPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
 
 
-def config() -> List[str]:
+def config() -> Tuple[List[str], float]:
     """
     The selection which elements to validate and fix.
+
+    Returns:
+        The selected validation criteria and the gap area of the "No Overlaps"
+        check.
     """
     col1, col2 = st.columns([6, 1])
 
@@ -49,7 +96,19 @@ def config() -> List[str]:
     if not validation_criteria:
         st.error("Please select at least one option to validate!")
         st.stop()
-    return validation_criteria
+    gap_area = 0.0
+    if "No Overlaps" in validation_criteria:
+        gap_area = col1.number_input(
+            "Gap area",
+            min_value=0.0,
+            value=0.0,
+            format="%g",
+            key=f"gap_area_{st.session_state.run_id}",
+            help="Gaps between features smaller than this area (in squared units "
+            "of the crs) fail the No Overlaps check as well and are filled by the "
+            "fix. 0 only checks the overlaps.",
+        )
+    return validation_criteria, gap_area
 
 
 def input() -> Union[GeoDataFrame, None]:
@@ -61,7 +120,8 @@ def input() -> Union[GeoDataFrame, None]:
     placeholder_text = col2_input.empty()
 
     filename = placeholder_file.file_uploader(
-        "Upload a vector file - GeoJSON/JSON, KML, WKT or zipped SHAPEFILE",
+        "Upload a vector file - GeoJSON/JSON, KML, WKT, zipped SHAPEFILE, "
+        "FlatGeobuf, GeoParquet or Arrow",
         type=FILETYPES,
         help="Zipped SHAPEFILE is a zipfile containing the shp,dbf,prj,shx files",
     )
@@ -94,15 +154,39 @@ def input() -> Union[GeoDataFrame, None]:
             help=text_help,
         )
 
-    if filename:
-        df = utils.read_vector_file_to_df(filename)
-    elif json_string != "":
-        df = utils.read_json_string_to_df(json_string)
-    else:
-        df = None
+    # The parsed input is cached by the hash of the input, reused on reruns.
+    try:
+        if filename:
+            input_hash = cache.hash_input(filename.getvalue(), filename.name)
+            df = cache.CACHE.get_or_compute(
+                ("input", input_hash), lambda: utils.read_vector_file_to_df(filename)
+            )
+        elif json_string != "":
+            input_hash = cache.hash_input(json_string.encode())
+            df = cache.CACHE.get_or_compute(
+                ("input", input_hash),
+                lambda: utils.read_json_string_to_df(json_string),
+            )
+        else:
+            input_hash = None
+            df = None
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    st.session_state["input_hash"] = input_hash
     return df
 
 
+@lru_cache(maxsize=None)
+def _init_bokeh() -> None:
+    """
+    Imports the plotting stack on the first map instead of at app start.
+    """
+    import pandas_bokeh
+
+    pandas_bokeh.output_notebook()
+
+
 def exploration(df: GeoDataFrame) -> None:
     """
     Data overview visualization elements - properties and map
@@ -119,17 +203,25 @@ def exploration(df: GeoDataFrame) -> None:
     )
     col1.write("")
     col1.write("")
-    with col1.expander("Click to expand - see full GeoJSON"):
-        st.write(df.__geo_interface__)
+    geojson_preview(df, col1, key="input_preview")
     col1.write("")
 
-    fig = df.reset_index().plot_bokeh(
+    map_df, map_mode = utils.reduce_for_map(
+        df, MAP_SIZE, MAP_MAX_FEATURES, MAP_MAX_POINTS
+    )
+    _init_bokeh()
+    fig = map_df.reset_index().plot_bokeh(
         show_figure=False,
-        figsize=(400, 250),
+        figsize=MAP_SIZE,
     )
     fig.xaxis.axis_label = ""
     fig.yaxis.axis_label = ""
     col2.bokeh_chart(fig)
+    vertices = shapely.get_num_coordinates(np.asarray(map_df.geometry.values)).sum()
+    col2.caption(
+        f"Drawn: {map_df.shape[0]} of {df.shape[0]} features as {map_mode}, "
+        f"{vertices} vertices"
+    )
 
     st.write("---")
 
@@ -149,7 +241,10 @@ def validation(vector: Vector, validation_criteria: List[str]) -> None:
         col2,
         col3,
         col4,
-    ) = st.columns(4)
+        col5,
+        col6,
+        col7,
+    ) = st.columns(7)
 
     if "No Self-Intersection" in validation_criteria:
         col1.markdown(
@@ -163,54 +258,273 @@ def validation(vector: Vector, validation_criteria: List[str]) -> None:
         col4.markdown(
             f"{symbol[vector.is_no_duplicated_vertices]} **No Duplicated Vertices**"
         )
+    if "No Overlaps" in validation_criteria:
+        col5.markdown(f"{symbol[vector.is_no_overlaps]} **No Overlaps**")
+    if "WGS84 / RFC 7946" in validation_criteria:
+        col6.markdown(f"{symbol[vector.is_4326]} **WGS84 / RFC 7946**")
+    if "Coordinate Precision" in validation_criteria:
+        col7.markdown(f"{symbol[vector.is_precise]} **Coordinate Precision**")
     if vector.valid_by_citeria:
         st.success("**VALID! Download or copy below.**")
     elif not vector.is_single_ring and vector.is_no_holes:
         st.error(f"**INVALID - FIX MANUALLY!** The Polygon has multiple rings.")
     else:
         st.error("**INVALID - FIXING AUTOMATICALLY ...**")
+    n_large = int(find_large_geometries(vector.geometries).sum())
+    if n_large:
+        st.caption(
+            f"{n_large} of {vector.df.shape[0]} features with "
+            f"{LARGE_GEOMETRY_VERTICES:,} or more vertices, checked on the pieces of "
+            "a grid in parallel and repaired one per thread."
+        )
+
 
+def report(vector: Vector, input_hash: str, validation_criteria: List[str]) -> None:
+    """
+    Paginated table of the features failing the validation criteria, filterable by
+    criteria. The report is computed once per input and criteria, the downloads are
+    served from it.
+    """
+    report_df = cache.report(vector, input_hash, validation_criteria)
+    with st.expander(f"Report: {report_df.shape[0]} invalid features"):
+        col1, col2 = st.columns([3, 1])
+        selected = col1.multiselect(
+            "Filter by failed criteria",
+            [c for c in validation_criteria if c in vector.feature_checks],
+            key="report_criteria",
+        )
+        filtered = report_df
+        if selected:
+            is_selected = np.zeros(report_df.shape[0], dtype=bool)
+            for criteria in selected:
+                is_selected |= report_df["failed"].str.contains(criteria, regex=False)
+            filtered = report_df[is_selected]
+        n_pages = max(1, -(-filtered.shape[0] // REPORT_PAGE_SIZE))
+        page = col2.number_input(
+            f"Page (of {n_pages})",
+            min_value=1,
+            max_value=n_pages,
+            value=1,
+            key="report_page",
+        )
+        start = (page - 1) * REPORT_PAGE_SIZE
+        st.dataframe(filtered.iloc[start : start + REPORT_PAGE_SIZE])
+        st.caption(f"{filtered.shape[0]} of {report_df.shape[0]} invalid features")
 
-def results(aoi: Vector) -> None:
+        for col, (report_format, (extension, mime)) in zip(
+            st.columns(len(REPORT_FORMATS)), REPORT_FORMATS.items()
+        ):
+            col.download_button(
+                f"Download report as {report_format}",
+                data=cache.serialize_report(
+                    report_df,
+                    report_format,
+                    input_hash,
+                    validation_criteria,
+                    vector.gap_area,
+                ),
+                file_name=f"report.{extension}",
+                mime=mime,
+            )
+
+
+def results(aoi: Vector, input_hash: str, validation_criteria: List[str]) -> None:
     """
-    Controls the results elements.
+    Controls the results elements. The output is serialized once per format and
+    served as a file download.
     """
     st.write("")
     _, col1, col2, _ = st.columns((0.1, 1, 2, 0.1))
-    download_geojson = aoi.df.__geo_interface__
-    utils.download_button(
-        json.dumps(download_geojson),
-        "aoi.geojson",
-        "Download as GeoJSON",
-        col1,
+    output_format = col1.selectbox("Output format", list(OUTPUT_FORMATS))
+    precision, rfc7946 = None, False
+    if output_format.startswith("GeoJSON"):
+        precision = col1.selectbox(
+            "Coordinate precision",
+            OUTPUT_PRECISIONS,
+            format_func=lambda p: "Full" if p is None else f"{p} decimals",
+        )
+        rfc7946 = col1.checkbox(
+            "RFC 7946",
+            help="Reprojects to EPSG:4326 and orients exterior rings "
+            "counterclockwise, interior rings clockwise.",
+        )
+    extension, mime = OUTPUT_FORMATS[output_format]
+    col1.download_button(
+        f"Download as {output_format}",
+        data=cache.serialize(
+            aoi.df,
+            output_format,
+            input_hash,
+            validation_criteria,
+            precision,
+            rfc7946,
+            aoi.gap_area,
+        ),
+        file_name=f"aoi.{extension}",
+        mime=mime,
+    )
+    geojson_preview(aoi.df, col2, key="result_preview")
+
+
+def geojson_preview(df: GeoDataFrame, st_element, key: str) -> None:
+    """
+    Paginated GeoJSON preview. Nothing is computed before the preview is opened,
+    then only the features of the visible page are converted to GeoJSON.
+
+    Args:
+        df: The dataframe to preview.
+        st_element: The Streamlit element (e.g. column) to place the preview in.
+        key: Unique widget key prefix.
+    """
+    if not st_element.checkbox("Click to show - see GeoJSON", key=f"{key}_show"):
+        return
+    n_pages = max(1, -(-df.shape[0] // PREVIEW_PAGE_SIZE))
+    page = st_element.number_input(
+        f"Page (of {n_pages}, {PREVIEW_PAGE_SIZE} features each)",
+        min_value=1,
+        max_value=n_pages,
+        value=1,
+        key=f"{key}_page",
     )
-    expander_result = col2.expander("Click to expand - see full GeoJSON")
-    expander_result.write(download_geojson)
-
-
-def fix(vector: Vector, validation_criteria: List[str]) -> Vector:
-    """
-    Controls the vector fix elements.
-    """
-    if (
-        "No Self-Intersection" in validation_criteria
-        and not vector.is_no_selfintersection
-    ):
-        vector.df.geometry = vector.df.geometry.apply(lambda x: x.buffer(0))
-        st.info("Removing Self-Intersections by applying buffer(0)...")
-    if "No Holes" in validation_criteria and not vector.is_no_holes:
-        vector.df.geometry = vector.df.geometry.apply(lambda x: utils.close_holes(x))
-        st.info("Closing holes in geometry...")
-    if "Counterclockwise" in validation_criteria and not vector.is_ccw:
-        vector.df.geometry = vector.df.geometry.apply(
-            lambda x: orient(x) if x.geom_type == "Polygon" else x
-        )
-        st.info("Applying right-hand/ccw winding ...")
-    if (
-        "No Duplicated Vertices" in validation_criteria
-        and not vector.is_no_duplicated_vertices
-    ):
-        vector.df.geometry = vector.df.geometry.simplify(0)
-        st.info("Removing duplicated vertices ...")
-
-    return vector
+    feature_id = st_element.text_input("Or jump to feature id", key=f"{key}_id")
+
+    if feature_id:
+        position = np.flatnonzero(df.index.astype(str) == feature_id.strip())
+        if not len(position):
+            st_element.error(f"No feature with id {feature_id}!")
+            return
+        page_df = df.iloc[position[:1]]
+    else:
+        start = (page - 1) * PREVIEW_PAGE_SIZE
+        page_df = df.iloc[start : start + PREVIEW_PAGE_SIZE]
+    st_element.json(
+        utils.truncate_coordinates(page_df.__geo_interface__, PREVIEW_MAX_COORDINATES)
+    )
+
+
+def job(
+    df: GeoDataFrame,
+    validation_criteria: List[str],
+    input_hash: str,
+    previous_run: Optional[Dict[str, Any]] = None,
+    gap_area: float = 0.0,
+) -> jobs.Job:
+    """
+    Checks and fixes the input in a background job and shows its progress and the
+    partial results until it is finished. Reruns of the app reattach to the running
+    job of the same input, criteria and gap area, a job of another input, criteria
+    or gap area is cancelled.
+
+    Returns:
+        The finished job.
+    """
+    key = jobs.Job.make_key(input_hash, validation_criteria, gap_area)
+    current = st.session_state.get("job")
+    if current is not None and current.key != key:
+        current.cancel()
+        current = None
+    if current is not None and current.status == "cancelled":
+        st.warning("**Validation cancelled.**")
+        if not st.button("Restart validation", key="job_restart"):
+            st.stop()
+        current = None
+    if current is None:
+        current = jobs.Job(
+            df, validation_criteria, input_hash, previous_run, gap_area=gap_area
+        )
+        current.start()
+        st.session_state["job"] = current
+
+    progress_bar = st.empty()
+    status = st.empty()
+    partial_results = st.empty()
+    cancel = st.empty()
+    if current.running:
+        cancel.button("Cancel", key="job_cancel", on_click=current.cancel)
+    symbol = ["🟥", "✅"]
+    while True:
+        running = current.running
+        stage = "Checking" if current.stage == "checks" else "Fixing invalid"
+        progress_bar.progress(
+            min(current.processed / current.total, 1.0) if current.total else 0.0
+        )
+        status.caption(
+            f"{stage} features: {current.processed:,} of {current.total:,} "
+            f"({current.throughput:,.0f} features/s)"
+            if current.total
+            else f"{stage} features ..."
+        )
+        partial_results.markdown(
+            "  \n".join(
+                f"{symbol[count == 0]} **{criteria}**: {count:,} invalid features"
+                for criteria, count in current.partial_results.items()
+            )
+        )
+        if not running:
+            break
+        time.sleep(JOB_POLL_SECONDS)
+
+    progress_bar.empty()
+    cancel.empty()
+    if current.status == "cancelled":
+        st.warning("**Validation cancelled.**")
+        st.button("Restart validation", key="job_restart")
+        st.stop()
+    if current.status == "failed":
+        st.error(f"**Validation failed:** {current.error}")
+        st.stop()
+    status.empty()
+    partial_results.empty()
+    return current
+
+
+def fix(
+    vector: Vector,
+    validation_criteria: List[str],
+    input_hash: str,
+    previous_run: Optional[Dict[str, Any]] = None,
+    finished_job: Optional[jobs.Job] = None,
+) -> Vector:
+    """
+    Controls the vector fix elements. Returns the fixed and re-validated vector.
+    The results of a finished background job are shown without fixing again.
+    """
+    if finished_job is not None:
+        fixed = finished_job.fixed
+        applied, repairs = finished_job.applied, finished_job.repairs
+    else:
+        fixed, applied, repairs = cache.fix(
+            vector, validation_criteria, input_hash, previous_run
+        )
+    st.session_state["previous_run"]["repairs"] = repairs
+    for message in applied:
+        st.info(message)
+    if fixes.FIX_MESSAGES["Coordinate Precision"] in applied:
+        before, after = cache.output_sizes(
+            vector.df, fixed.df, input_hash, validation_criteria, vector.gap_area
+        )
+        col1, col2 = st.columns(2)
+        col1.metric(
+            "Vertices",
+            f"{after['vertices']:,}",
+            delta=f"{after['vertices'] - before['vertices']:,}",
+            delta_color="inverse",
+        )
+        col2.metric(
+            "GeoJSON size",
+            f"{after['bytes'] / 1e3:,.1f} KB",
+            delta=f"{(after['bytes'] - before['bytes']) / 1e3:,.1f} KB",
+            delta_color="inverse",
+        )
+
+    return fixed
+
+
+def performance(profiler: Profiler) -> None:
+    """
+    Collapsible panel with the timing and memory of the pipeline stages.
+    """
+    st.markdown("---")
+    with st.expander("Performance"):
+        st.table(pd.DataFrame(profiler.records).drop(columns=["event", "run_id"]))
+        st.caption(f"Cache: {cache.CACHE.stats()}")
@@ -0,0 +1,444 @@
+"""
+Contains the geometry fixes, independent of the app elements.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+import os
+from typing import Callable, List, Optional, Dict, Tuple
+
+import numpy as np
+import shapely
+from geopandas import GeoSeries
+from shapely.geometry.base import BaseGeometry
+
+import utils
+from validation import (
+    Vector,
+    COORDINATE_GRID_SIZE,
+    CRITERIA_FLAGS,
+    INTER_FEATURE_CRITERIA,
+    check_no_selfintersection,
+    find_gaps,
+    find_large_geometries,
+    find_overlaps,
+    find_redundant_vertices,
+    get_position_in_group,
+    grid_size_for_crs,
+    is_wgs84,
+    iter_ragged_linework,
+    make_valid_where_invalid,
+    map_threaded,
+)
+
+
+# Below this number of geometries the repair always runs in the current process.
+PARALLEL_THRESHOLD = 50_000
+
+FIX_MESSAGES = {
+    "WGS84 / RFC 7946": "Reprojecting to WGS84 (EPSG:4326) ...",
+    "No Self-Intersection": "Removing Self-Intersections by applying buffer(0)...",
+    "No Holes": "Closing holes in geometry...",
+    "Counterclockwise": "Applying right-hand/ccw winding ...",
+    "No Duplicated Vertices": "Removing duplicated vertices ...",
+    "No Overlaps": "Removing overlaps and filling gaps, earlier features take "
+    "priority ...",
+    "Coordinate Precision": "Snapping coordinates to the grid and removing "
+    "redundant vertices ...",
+}
+
+
+def repair_geometry(geometry: BaseGeometry, steps: List[str]) -> BaseGeometry:
+    """
+    Applies all fix steps, in the given order, to a single geometry.
+
+    Args:
+        geometry: Input shapely geometry.
+        steps: The validation criteria to fix.
+    """
+    if geometry is None:
+        return None
+    for step in steps:
+        if step == "No Self-Intersection":
+            geometry = geometry.buffer(0)
+        elif step == "No Holes":
+            geometry = utils.close_holes(geometry)
+        elif step == "Counterclockwise":
+            geometry = utils.orient_ccw(geometry)
+        elif step == "No Duplicated Vertices":
+            geometry = geometry.simplify(0)
+    return geometry
+
+
+def remove_redundant_vertices(geometries: np.ndarray) -> np.ndarray:
+    """
+    Removes the collinear and repeated vertices (see find_redundant_vertices) over
+    the flat coordinate arrays, the geometries are rebuilt per type at once.
+    """
+    geometries = geometries.copy()
+    for geometry_type, positions, coords, offsets, min_coords in iter_ragged_linework(
+        geometries
+    ):
+        line_offsets = offsets[0]
+        is_kept = ~find_redundant_vertices(coords, line_offsets, min_coords)
+        if is_kept.all():
+            continue
+        line_index = np.repeat(np.arange(len(line_offsets) - 1), np.diff(line_offsets))
+        n_kept = np.bincount(line_index[is_kept], minlength=len(line_offsets) - 1)
+        geometries[positions] = shapely.from_ragged_array(
+            geometry_type,
+            coords[is_kept],
+            (np.r_[0, np.cumsum(n_kept)], *offsets[1:]),
+        )
+    return geometries
+
+
+def reduce_precision(
+    geometries: np.ndarray, grid_size: float = COORDINATE_GRID_SIZE
+) -> np.ndarray:
+    """
+    Snaps the coordinates to the grid and removes the redundant vertices, the
+    valid geometries stay valid. Geometries that would collapse on the grid are
+    kept.
+
+    Args:
+        geometries: Array of shapely geometries.
+        grid_size: Cell size of the grid in crs units.
+    """
+    snapped = shapely.set_precision(geometries, grid_size, mode="pointwise")
+    # Pointwise snapping changes the type of empty geometries.
+    is_empty = shapely.is_empty(geometries)
+    snapped[is_empty] = geometries[is_empty]
+    # Snap rounding keeps valid geometries valid, but is much slower and only used
+    # where the pointwise snapping breaks the validity. It returns clockwise
+    # exterior rings.
+    is_invalid = np.flatnonzero(~check_no_selfintersection(snapped) & ~is_empty)
+    broken = is_invalid[check_no_selfintersection(geometries[is_invalid])]
+    snapped[broken] = shapely.orient_polygons(
+        shapely.set_precision(geometries[broken], grid_size), exterior_cw=False
+    )
+    is_collapsed = shapely.is_empty(snapped) & ~is_empty
+    snapped[is_collapsed] = geometries[is_collapsed]
+    return remove_redundant_vertices(snapped)
+
+
+def repair_geometries(
+    geometries: np.ndarray,
+    steps: List[str],
+    grid_size: float = COORDINATE_GRID_SIZE,
+) -> np.ndarray:
+    """
+    Repairs the array of geometries in a single pass, each geometry is fixed by all
+    steps at once. The coordinate precision is reduced last, in batch over all
+    geometries.
+
+    Args:
+        geometries: Array of shapely geometries.
+        steps: The validation criteria to fix.
+        grid_size: Grid of the "Coordinate Precision" fix in crs units.
+    """
+    repaired = np.empty(len(geometries), dtype=object)
+    is_large = find_large_geometries(geometries)
+    repaired[~is_large] = [repair_geometry(g, steps) for g in geometries[~is_large]]
+    # The large geometries are repaired concurrently, one per thread.
+    repaired[is_large] = map_threaded(
+        lambda large: np.array(
+            [repair_geometry(g, steps) for g in large], dtype=object
+        ),
+        geometries[is_large],
+        chunks=int(is_large.sum()),
+    )
+    if "Coordinate Precision" in steps:
+        repaired = reduce_precision(repaired, grid_size)
+    return repaired
+
+
+def remove_overlaps(
+    geometries: np.ndarray, priority: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Removes the overlaps between features, the area of an overlap stays with the
+    feature of higher priority and is cut from the other one. Only the features
+    losing area are modified.
+
+    The cut features are processed in bulk, one vectorized difference per rank of
+    their overlapping features, so the number of passes is the maximum number of
+    higher priority features a single feature overlaps with.
+
+    Args:
+        geometries: Array of shapely geometries.
+        priority: Rank per feature, lower ranks win. Defaults to the feature order.
+
+    Returns:
+        The geometries without overlaps and the positions of the modified features.
+    """
+    if priority is None:
+        priority = np.arange(len(geometries))
+    overlaps = find_overlaps(geometries)
+    if overlaps.empty:
+        return geometries, np.array([], dtype=int)
+    pairs = overlaps[["feature", "other"]].to_numpy().T
+    # Sorted into (winner, loser) rows, grouped by loser.
+    swap = priority[pairs[0]] > priority[pairs[1]]
+    winner = np.where(swap, pairs[1], pairs[0])
+    loser = np.where(swap, pairs[0], pairs[1])
+    order = np.argsort(loser, kind="stable")
+    winner, loser = winner[order], loser[order]
+    rank = get_position_in_group(loser)
+
+    geometries = geometries.copy()
+    involved = np.unique(pairs)
+    geometries[involved] = make_valid_where_invalid(geometries[involved])
+    # Cutting with the original winners gives the same result as cutting in
+    # priority order, as the winners' overlaps are removed from the losers anyway.
+    winners = geometries.copy()
+    for r in range(rank.max() + 1):
+        at_rank = rank == r
+        cut = loser[at_rank]
+        geometries[cut] = shapely.difference(
+            geometries[cut], winners[winner[at_rank]]
+        )
+    return geometries, np.unique(loser)
+
+
+def fill_gaps(
+    geometries: np.ndarray, max_area: float, priority: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fills the gaps between features smaller than max_area (see find_gaps), each gap
+    is merged into the adjacent feature of highest priority.
+
+    Args:
+        geometries: Array of shapely geometries.
+        max_area: Only smaller gaps are filled.
+        priority: Rank per feature, lower ranks win. Defaults to the feature order.
+
+    Returns:
+        The geometries without gaps and the positions of the modified features.
+    """
+    if priority is None:
+        priority = np.arange(len(geometries))
+    gaps = find_gaps(geometries, max_area)
+    if gaps.empty:
+        return geometries, np.array([], dtype=int)
+    gaps["priority"] = priority[gaps["feature"].to_numpy()]
+    # One row per gap with its winning feature, grouped by feature.
+    gaps = gaps.sort_values(["priority", "gap"]).drop_duplicates("gap")
+    feature, gap = gaps["feature"].to_numpy(), gaps["geometry"].to_numpy()
+    order = np.argsort(feature, kind="stable")
+    feature, gap = feature[order], gap[order]
+    rank = get_position_in_group(feature)
+
+    geometries = geometries.copy()
+    filled = np.unique(feature)
+    geometries[filled] = make_valid_where_invalid(geometries[filled])
+    for r in range(rank.max() + 1):
+        at_rank = rank == r
+        geometries[feature[at_rank]] = shapely.union(
+            geometries[feature[at_rank]], gap[at_rank]
+        )
+    return geometries, filled
+
+
+def _concat_wkb(wkb: np.ndarray) -> Tuple[np.ndarray, bytes]:
+    """
+    Concatenates WKB geometries into one buffer and the offsets of each geometry.
+    Missing geometries are encoded with length 0.
+    """
+    lengths = [len(w) if w is not None else 0 for w in wkb]
+    offsets = np.r_[0, np.cumsum(lengths, dtype=np.int64)]
+    return offsets, b"".join(w for w in wkb if w is not None)
+
+
+def _split_wkb(offsets: np.ndarray, buffer) -> np.ndarray:
+    wkb = [
+        bytes(buffer[start:end]) if end > start else None
+        for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+    return shapely.from_wkb(wkb)
+
+
+def _repair_partition(
+    shm_name: str, offsets: np.ndarray, steps: List[str], grid_size: float
+) -> Tuple[np.ndarray, bytes]:
+    """
+    Worker process part of the parallel repair. Reads its partition of WKB
+    geometries from the shared memory and returns the repaired geometries as WKB.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        geometries = _split_wkb(offsets, shm.buf)
+    finally:
+        shm.close()
+    return _concat_wkb(
+        shapely.to_wkb(repair_geometries(geometries, steps, grid_size))
+    )
+
+
+_POOLS: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    The worker processes are kept alive and reused by later repairs. Spawned instead
+    of forked, as forking the multi-threaded Streamlit server is not safe.
+    """
+    if workers not in _POOLS:
+        _POOLS[workers] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn")
+        )
+    return _POOLS[workers]
+
+
+def repair_geometries_parallel(
+    geometries: np.ndarray,
+    steps: List[str],
+    workers: int,
+    grid_size: float = COORDINATE_GRID_SIZE,
+) -> np.ndarray:
+    """
+    Parallel version of repair_geometries with identical results. The geometries
+    are split into partitions that are repaired in worker processes. The input is
+    passed as WKB via shared memory, the partitions are reassembled in order.
+
+    Args:
+        geometries: Array of shapely geometries.
+        steps: The validation criteria to fix.
+        workers: Number of worker processes.
+        grid_size: Grid of the "Coordinate Precision" fix in crs units.
+    """
+    offsets, body = _concat_wkb(shapely.to_wkb(geometries))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(body)))
+    try:
+        shm.buf[: len(body)] = body
+        bounds = np.linspace(0, len(geometries), workers * 2 + 1).astype(int)
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(
+                _repair_partition,
+                shm.name,
+                offsets[start : end + 1],
+                steps,
+                grid_size,
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+            if end > start
+        ]
+        partitions = [_split_wkb(*future.result()) for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    return np.concatenate(partitions) if partitions else geometries
+
+
+def failed_criteria(vector: Vector, validation_criteria: List[str]) -> List[str]:
+    """
+    The selected validation criteria that the vector fails.
+    """
+    return [
+        criteria
+        for criteria in FIX_MESSAGES
+        if criteria in validation_criteria
+        and not getattr(vector, CRITERIA_FLAGS[criteria])
+    ]
+
+
+def fix(
+    vector: Vector,
+    validation_criteria: List[str],
+    workers: Optional[int] = None,
+    parallel_threshold: int = PARALLEL_THRESHOLD,
+    known_repairs: Optional[Dict[int, BaseGeometry]] = None,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int], None]] = None,
+) -> List[str]:
+    """
+    Fixes the features that fail any of the selected validation criteria and
+    re-validates only these features. All other features are not touched, except
+    for the reprojection of all features if the crs is not WGS84.
+
+    Args:
+        vector: The evaluated vector validation object, modified in place.
+        validation_criteria: The list of selected validation criteria.
+        workers: Number of worker processes for the repair, defaults to the number
+            of CPUs. 1 always repairs in the current process.
+        parallel_threshold: Minimum number of geometries to repair for the parallel
+            repair, in total over all chunks.
+        known_repairs: Already repaired geometries with the same criteria by
+            feature position, e.g. of features unchanged since a previous run, these
+            are not repaired again. Updated in place with the new repairs.
+        chunk_size: Repair the invalid features in chunks of this many features.
+        on_chunk: Called after each chunk with the number of repaired features and
+            the number of features to repair.
+
+    Returns:
+        The descriptions of the applied fixes.
+    """
+    failed = failed_criteria(vector, validation_criteria)
+    if not failed:
+        return []
+    reprojected = []
+    if "WGS84 / RFC 7946" in failed and not is_wgs84(vector.df.crs):
+        # Reprojected first, the other checks and fixes depend on the coordinates.
+        vector.df = utils.to_wgs84(vector.df)
+        vector.update_feature_checks(
+            np.arange(vector.df.shape[0]), validation_criteria
+        )
+        reprojected = ["WGS84 / RFC 7946"]
+        failed = failed_criteria(vector, validation_criteria)
+    # Coordinates outside of the WGS84 bounds can not be fixed automatically.
+    failed = [criteria for criteria in failed if criteria != "WGS84 / RFC 7946"]
+    if not failed:
+        return [FIX_MESSAGES[criteria] for criteria in reprojected]
+    is_invalid = np.zeros(len(vector.df), dtype=bool)
+    for criteria in failed:
+        if criteria not in INTER_FEATURE_CRITERIA:
+            is_invalid |= ~vector.feature_checks[criteria]
+    index = np.flatnonzero(is_invalid)
+    # All selected fixes are applied to the invalid features, as a fix can break
+    # another criteria, e.g. buffer(0) returns clockwise exterior rings.
+    steps = [
+        criteria
+        for criteria in FIX_MESSAGES
+        if criteria in validation_criteria
+        and criteria not in INTER_FEATURE_CRITERIA + ["WGS84 / RFC 7946"]
+    ]
+
+    known_repairs = {} if known_repairs is None else known_repairs
+    is_known = np.isin(index, np.fromiter(known_repairs, dtype=int))
+    unknown = index[~is_known]
+
+    geometries = vector.geometries.copy()
+    grid_size = grid_size_for_crs(vector.df.crs)
+    workers = workers or os.cpu_count() or 1
+    # Decided by the total, so that the chunks of a large repair run in parallel too.
+    parallel = workers > 1 and len(unknown) >= parallel_threshold
+    chunk_size = chunk_size or max(len(unknown), 1)
+    for start in range(0, len(unknown), chunk_size):
+        chunk = unknown[start : start + chunk_size]
+        if parallel:
+            repaired = repair_geometries_parallel(
+                geometries[chunk], steps, workers, grid_size
+            )
+        else:
+            repaired = repair_geometries(geometries[chunk], steps, grid_size)
+        geometries[chunk] = repaired
+        known_repairs.update(zip(chunk.tolist(), repaired))
+        if on_chunk is not None:
+            on_chunk(start + len(chunk), len(unknown))
+    geometries[index[is_known]] = [known_repairs[i] for i in index[is_known].tolist()]
+    if "No Overlaps" in failed:
+        geometries, cut = remove_overlaps(geometries)
+        if vector.gap_area > 0:
+            geometries, filled = fill_gaps(geometries, vector.gap_area)
+            cut = np.union1d(cut, filled)
+        # The cut and filled features are fixed again, except for closing holes, as a
+        # hole can be the removed overlap.
+        geometries[cut] = repair_geometries(
+            geometries[cut], [step for step in steps if step != "No Holes"], grid_size
+        )
+        index = np.union1d(index, cut)
+    vector.df.geometry = GeoSeries(geometries, index=vector.df.index, crs=vector.df.crs)
+    vector.update_feature_checks(index, validation_criteria)
+
+    return [FIX_MESSAGES[criteria] for criteria in reprojected + failed]
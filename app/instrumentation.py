@@ -0,0 +1,117 @@
+"""
+Optional per-stage timing and memory instrumentation of the app pipeline. Enabled
+with the environment variable VECTOR_VALIDATOR_PROFILE=1, otherwise the stages are
+not measured at all.
+
+Only the standard library is imported at module level, so the imports of the app
+itself can be measured as a stage.
+"""
+
+from contextlib import contextmanager
+import json
+import logging
+import os
+import time
+import tracemalloc
+import uuid
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Union
+
+if TYPE_CHECKING:
+    from geopandas import GeoDataFrame
+    from validation import Vector
+
+
+ENABLED = os.environ.get("VECTOR_VALIDATOR_PROFILE", "0") == "1"
+
+logger = logging.getLogger("vector_validator.performance")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Stage:
+    """
+    Measurement of a single pipeline stage.
+    """
+
+    def __init__(self, name: str):
+        self.record: Dict = {"stage": name, "features": None, "vertices": None}
+
+    def count(self, data: Union["GeoDataFrame", "Vector", None]) -> None:
+        """
+        Records the number of features and vertices the stage processed.
+        """
+        import numpy as np
+        import shapely
+        from validation import Vector
+
+        if isinstance(data, Vector):
+            data = data.df
+        if data is None:
+            return
+        geometries = np.asarray(data.geometry.values)
+        self.record["features"] = len(geometries)
+        self.record["vertices"] = int(shapely.get_num_coordinates(geometries).sum())
+
+
+class _DisabledStage(Stage):
+    def __init__(self):
+        pass
+
+    def count(self, data: Union["GeoDataFrame", "Vector", None]) -> None:
+        pass
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+
+class Profiler:
+    """
+    Collects wall time, peak memory and feature/vertex counts per stage of one app
+    run and emits each stage as a JSON log line.
+
+    The peak memory is traced with tracemalloc, which covers Python and numpy but not
+    the GEOS allocations, and is shared by all concurrent sessions of the server.
+
+    Example:
+        with profiler.stage("validation") as stage:
+            vector = ...
+            stage.count(vector)
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = ENABLED if enabled is None else enabled
+        self.run_id = uuid.uuid4().hex
+        self.records: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        if not self.enabled:
+            yield _DISABLED_STAGE
+            return
+
+        stage = Stage(name)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            record = {
+                "event": "stage",
+                "run_id": self.run_id,
+                **stage.record,
+                "seconds": round(seconds, 6),
+                "peak_memory_mb": round(peak / 1024**2, 3),
+            }
+            self.records.append(record)
+            logger.info(json.dumps(record))
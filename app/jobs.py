@@ -0,0 +1,166 @@
+"""
+Background jobs that check and fix large inputs in chunks of features. A job runs in
+a thread and is kept in the session state, so the page can show its progress and
+partial results, cancel it, and reattach to it when the app script reruns.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+from geopandas import GeoDataFrame
+from shapely.geometry.base import BaseGeometry
+
+import cache
+from validation import Vector
+
+
+JOB_CHUNK_SIZE = 10_000
+
+
+class JobCancelled(Exception):
+    """
+    Raised in the job thread after the job was cancelled.
+    """
+
+
+class Job:
+    """
+    Validation and fix of one input with the selected criteria in a background
+    thread.
+
+    Example:
+        job = Job(df, validation_criteria, input_hash)
+        job.start()
+        while job.running:
+            print(job.stage, job.processed, job.total)
+            time.sleep(0.5)
+    """
+
+    def __init__(
+        self,
+        df: GeoDataFrame,
+        validation_criteria: List[str],
+        input_hash: str,
+        previous_run: Optional[Dict[str, Any]] = None,
+        chunk_size: int = JOB_CHUNK_SIZE,
+        gap_area: float = 0.0,
+    ):
+        self.df = df
+        self.validation_criteria = validation_criteria
+        self.input_hash = input_hash
+        self.previous_run = previous_run
+        self.chunk_size = chunk_size
+        self.gap_area = gap_area
+
+        # One of "pending", "running", "done", "cancelled", "failed"
+        self.status = "pending"
+        self.stage = "checks"
+        self.processed = 0
+        self.total = df.shape[0]
+        # Invalid features per criteria of the features checked so far.
+        self.partial_results: Dict[str, int] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[Exception] = None
+
+        self.vector: Optional[Vector] = None
+        self.fixed: Optional[Vector] = None
+        self.applied: List[str] = []
+        self.repairs: Dict[int, BaseGeometry] = {}
+
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def make_key(
+        input_hash: str, validation_criteria: List[str], gap_area: float = 0.0
+    ) -> Hashable:
+        return input_hash, tuple(sorted(validation_criteria)), gap_area
+
+    @property
+    def key(self) -> Hashable:
+        return self.make_key(self.input_hash, self.validation_criteria, self.gap_area)
+
+    @property
+    def running(self) -> bool:
+        return self.status in ("pending", "running")
+
+    @property
+    def throughput(self) -> float:
+        """
+        Processed features per second of the current stage.
+        """
+        if self.started_at is None:
+            return 0.0
+        seconds = (self.finished_at or time.perf_counter()) - self.started_at
+        return self.processed / seconds if seconds > 0 else 0.0
+
+    def start(self) -> None:
+        self.status = "running"
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """
+        Stops the job after the current chunk.
+        """
+        self._cancel.set()
+
+    def _on_checks(
+        self, processed: int, total: int, feature_checks: Dict[str, np.ndarray]
+    ) -> None:
+        self.partial_results = {
+            criteria: int((~feature_checks[criteria]).sum())
+            for criteria in self.validation_criteria
+            if criteria in feature_checks
+        }
+        self._on_chunk(processed, total)
+
+    def _on_chunk(self, processed: int, total: int) -> None:
+        self.processed, self.total = processed, total
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _start_stage(self, stage: str) -> None:
+        self.stage = stage
+        self.processed = 0
+        self.started_at = time.perf_counter()
+
+    def _run(self) -> None:
+        try:
+            self._start_stage("checks")
+            self.vector = cache.validate(
+                self.df,
+                self.validation_criteria,
+                self.input_hash,
+                self.previous_run,
+                self.chunk_size,
+                self._on_checks,
+                self.gap_area,
+            )
+            self.partial_results = {
+                criteria: int((~self.vector.feature_checks[criteria]).sum())
+                for criteria in self.validation_criteria
+            }
+            if not self.vector.valid_by_citeria:
+                self._start_stage("fix")
+                self.total = 0
+                self.fixed, self.applied, self.repairs = cache.fix(
+                    self.vector,
+                    self.validation_criteria,
+                    self.input_hash,
+                    self.previous_run,
+                    self.chunk_size,
+                    self._on_chunk,
+                )
+            else:
+                self.fixed = self.vector
+            self.status = "done"
+        except JobCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = e
+            self.status = "failed"
+        finally:
+            self.finished_at = time.perf_counter()
@@ -1,9 +1,8 @@
 import streamlit as st
 from streamlit_lottie import st_lottie
 
-import components
-import utils
-from validation import Vector
+import assets
+import instrumentation
 
 st.set_page_config(
     page_title="Vector Validator",
@@ -13,10 +12,10 @@ st.set_page_config(
 )
 
 col1_header, col2_header = st.columns([1, 6])
-lottie_url = "https://assets10.lottiefiles.com/temp/lf20_YQB3X3.json"
-lottie_json = utils.load_lottieurl(lottie_url)
-with col1_header:
-    st_lottie(lottie_json, height=100, speed=1)
+lottie_json = assets.load_lottie()
+if lottie_json is not None:
+    with col1_header:
+        st_lottie(lottie_json, height=100, speed=1)
 
 col2_header.write("")
 col2_header.title(f"Vector Validator")
@@ -31,27 +30,67 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-validation_criteria = components.config()
+profiler = instrumentation.Profiler()
+
+# The header renders before the geo stack is imported.
+with profiler.stage("import"):
+    import cache
+    import components
+
+validation_criteria, gap_area = components.config()
 st.write("")
 st.write("")
 
-df = components.input()
+with profiler.stage("input") as stage:
+    df = components.input()
+    stage.count(df)
 
 if df is None:
     st.stop()
 
-components.exploration(df)
+with profiler.stage("exploration") as stage:
+    components.exploration(df)
+    stage.count(df)
 
-vector = Vector(df)
-vector.run_validation_checks(validation_criteria)
-components.validation(vector, validation_criteria)
+input_hash = st.session_state["input_hash"]
+# Only the added or changed features of an edited input are checked and fixed again.
+previous_run = st.session_state.get("previous_run")
+with profiler.stage("validation") as stage:
+    if df.shape[0] >= components.JOB_MIN_FEATURES:
+        # Large inputs are checked and fixed in a background job showing its progress.
+        job = components.job(
+            df, validation_criteria, input_hash, previous_run, gap_area
+        )
+        vector = job.vector
+    else:
+        job = None
+        vector = cache.validate(
+            df, validation_criteria, input_hash, previous_run, gap_area=gap_area
+        )
+    st.session_state["previous_run"] = cache.run_record(
+        vector, input_hash, validation_criteria
+    )
+    components.validation(vector, validation_criteria)
+    stage.count(vector)
 
 if not vector.valid_by_citeria:
-    vector = components.fix(vector, validation_criteria)
-    st.markdown("---")
-    vector.run_validation_checks(validation_criteria)
-    components.validation(vector, validation_criteria)
+    with profiler.stage("report") as stage:
+        components.report(vector, input_hash, validation_criteria)
+        stage.count(vector)
+
+    with profiler.stage("fix") as stage:
+        vector = components.fix(
+            vector, validation_criteria, input_hash, previous_run, job
+        )
+        st.markdown("---")
+        components.validation(vector, validation_criteria)
+        stage.count(vector)
 
 if vector.valid_by_citeria:
     st.markdown("---")
-    components.results(vector)
+    with profiler.stage("results") as stage:
+        components.results(vector, input_hash, validation_criteria)
+        stage.count(vector)
+
+if profiler.enabled:
+    components.performance(profiler)
@@ -0,0 +1,261 @@
+"""
+ASGI service for programmatic validation and fixing.
+
+Run with:
+    uvicorn service:app --app-dir app --port 8000
+
+Endpoints:
+    POST /validate  JSON body {"geojson": ..., "criteria": [...], "fix": true,
+                    "gap_area": 0}, the geojson can be anything the app accepts as
+                    pasted text. Or a multipart form with a "file" upload and
+                    optional "criteria", "fix" and "gap_area" fields.
+    GET /health     Worker and queue status.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from io import BytesIO
+import json
+from multiprocessing import get_context
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyogrio.errors
+import shapely.errors
+from geopandas import GeoDataFrame
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import fixes
+import utils
+from validation import Vector, VALIDATION_CRITERIA, ADDITIONAL_VALIDATION_CRITERIA
+
+
+WORKERS = int(os.environ.get("VECTOR_VALIDATOR_WORKERS", os.cpu_count() or 1))
+# Requests waiting for a free worker, above the service responds with 429.
+MAX_QUEUE = int(os.environ.get("VECTOR_VALIDATOR_MAX_QUEUE", 16))
+# Errors of parsing malformed inputs, responded with 400 instead of 500.
+INPUT_ERRORS = (
+    ValueError,
+    KeyError,
+    TypeError,
+    IndexError,
+    shapely.errors.ShapelyError,
+    pyogrio.errors.DataSourceError,
+    pyogrio.errors.DataLayerError,
+)
+
+
+class InputError(Exception):
+    """
+    Raised in the workers if the input can not be read, responded with 400.
+    """
+
+
+def _read_input(data: bytes, filename: Optional[str]) -> GeoDataFrame:
+    try:
+        if filename is None:
+            return utils.read_json_string_to_df(data.decode("utf-8"))
+        uploaded_file = BytesIO(data)
+        uploaded_file.name = filename
+        return utils.read_vector_file_to_df(uploaded_file)
+    except INPUT_ERRORS as e:
+        # Raised as InputError, the library exceptions may not survive pickling.
+        raise InputError(f"Invalid input: {e}") from None
+
+
+def _check_results(vector: Vector, validation_criteria: List[str]) -> Dict[str, Any]:
+    return {
+        criteria: {
+            "valid": bool(vector.feature_checks[criteria].all()),
+            "invalid_features": (~vector.feature_checks[criteria]).nonzero()[0].tolist(),
+        }
+        for criteria in validation_criteria
+    }
+
+
+def _parse_fix(value: Any) -> Optional[bool]:
+    """The fix option as bool, from JSON or form values. None if not a boolean."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return None
+
+
+def _parse_gap_area(value: Any) -> Optional[float]:
+    """The gap area from JSON or form values. None if not a non-negative number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        gap_area = float(value)
+    except (TypeError, ValueError):
+        return None
+    return gap_area if gap_area >= 0 else None
+
+
+def process_input(
+    data: bytes,
+    filename: Optional[str],
+    validation_criteria: List[str],
+    fix: bool,
+    gap_area: float = 0.0,
+) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Validates and optionally fixes the input, runs in the worker processes.
+
+    Args:
+        data: The uploaded file content, or the GeoJSON text if filename is None.
+        filename: Name of the uploaded file, determines the file format.
+        validation_criteria: The list of validation criteria to check and fix.
+        fix: Fix the invalid features.
+        gap_area: Gaps between features smaller than this area fail the "No
+            Overlaps" check as well and are filled, 0 only checks the overlaps.
+
+    Returns:
+        The check results and the resulting GeoJSON.
+
+    Raises:
+        InputError: The input can not be read.
+    """
+    df = _read_input(data, filename)
+    vector = Vector(df)
+    vector.run_validation_checks(validation_criteria, gap_area=gap_area)
+    result = {
+        "features": int(df.shape[0]),
+        "valid_before": vector.valid_by_citeria,
+        "checks_before": _check_results(vector, validation_criteria),
+        "fixes": [],
+    }
+    if fix and not vector.valid_by_citeria:
+        # Requests are processed in parallel, each repair stays in its worker.
+        result["fixes"] = fixes.fix(vector, validation_criteria, workers=1)
+    result["valid"] = vector.valid_by_citeria
+    result["checks"] = _check_results(vector, validation_criteria)
+    return result, utils.write_df_to_bytes(vector.df, "GeoJSON")
+
+
+def _create_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+
+def create_app(workers: int = WORKERS, max_queue: int = MAX_QUEUE) -> Starlette:
+    """
+    Creates the service. The validation runs in a pool of worker processes, at most
+    workers + max_queue requests are accepted at the same time.
+    """
+    state = {"pool": None, "active": 0}
+    max_active = workers + max_queue
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        state["pool"] = _create_pool(workers)
+        try:
+            yield
+        finally:
+            state["pool"].shutdown(cancel_futures=True)
+
+    async def validate(request: Request) -> Response:
+        if state["active"] >= max_active:
+            return JSONResponse(
+                {"error": "Too many requests, retry later."},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        state["active"] += 1
+        try:
+            if request.headers.get("content-type", "").startswith(
+                "multipart/form-data"
+            ):
+                form = await request.form()
+                upload = form.get("file")
+                if upload is None or isinstance(upload, str):
+                    return JSONResponse({"error": "Missing file upload."}, 400)
+                data, filename = await upload.read(), upload.filename
+                validation_criteria = form.getlist("criteria") or VALIDATION_CRITERIA
+                fix = _parse_fix(form.get("fix", "true"))
+                gap_area = _parse_gap_area(form.get("gap_area", 0))
+            else:
+                try:
+                    body = await request.json()
+                except json.JSONDecodeError:
+                    return JSONResponse({"error": "Invalid JSON body."}, 400)
+                if not isinstance(body, dict) or "geojson" not in body:
+                    return JSONResponse({"error": "Missing geojson."}, 400)
+                geojson = body["geojson"]
+                if not isinstance(geojson, str):
+                    geojson = json.dumps(geojson)
+                data, filename = geojson.encode(), None
+                validation_criteria = body.get("criteria") or VALIDATION_CRITERIA
+                fix = _parse_fix(body.get("fix", True))
+                gap_area = _parse_gap_area(body.get("gap_area", 0))
+            if fix is None:
+                return JSONResponse({"error": "fix must be true or false."}, 400)
+            if gap_area is None:
+                return JSONResponse(
+                    {"error": "gap_area must be a non-negative number."}, 400
+                )
+            if not isinstance(validation_criteria, list) or not all(
+                isinstance(criteria, str) for criteria in validation_criteria
+            ):
+                return JSONResponse(
+                    {"error": "criteria must be a list of criteria names."}, 400
+                )
+
+            unknown = set(validation_criteria) - set(
+                VALIDATION_CRITERIA + ADDITIONAL_VALIDATION_CRITERIA
+            )
+            if unknown:
+                return JSONResponse(
+                    {"error": f"Unknown criteria: {sorted(unknown)}"}, 400
+                )
+
+            loop = asyncio.get_running_loop()
+            pool = state["pool"]
+            try:
+                result, geojson_bytes = await loop.run_in_executor(
+                    pool,
+                    process_input,
+                    data,
+                    filename,
+                    list(validation_criteria),
+                    fix,
+                    gap_area,
+                )
+            except InputError as e:
+                return JSONResponse({"error": str(e)}, 400)
+            except BrokenProcessPool:
+                # A crashed worker breaks the whole pool, the first request to
+                # notice replaces it.
+                if state["pool"] is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    state["pool"] = _create_pool(workers)
+                return JSONResponse(
+                    {"error": "The worker crashed processing the request."}, 500
+                )
+        finally:
+            state["active"] -= 1
+
+        # The GeoJSON is inserted as is, instead of parsing and dumping it again.
+        content = json.dumps(result)[:-1].encode() + b', "geojson": ' + geojson_bytes
+        return Response(content + b"}", media_type="application/json")
+
+    async def health(request: Request) -> Response:
+        return JSONResponse(
+            {"workers": workers, "active": state["active"], "max_active": max_active}
+        )
+
+    return Starlette(
+        routes=[
+            Route("/validate", validate, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_app()
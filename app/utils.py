@@ -1,19 +1,26 @@
-import base64
-import re
-import uuid
-from typing import Union, Dict
+from functools import lru_cache
+from itertools import chain
+from io import BufferedReader, BytesIO, FileIO
+from typing import Union, Dict, List, BinaryIO, Iterator, Optional, Tuple
 from pathlib import Path
+from tempfile import TemporaryDirectory
+import zlib
 
-import requests
-import streamlit as st
-import geojson
-from geojson import Feature, FeatureCollection
 import geopandas as gpd
-from geopandas import GeoDataFrame
+from geopandas import GeoDataFrame, GeoSeries
+import numpy as np
+import orjson
 import pandas as pd
 import shapely
-from shapely.geometry import Polygon, box, mapping
-from fiona.io import ZipMemoryFile
+from shapely.geometry import Polygon, MultiPolygon, box, mapping, shape
+from shapely.geometry.base import BaseGeometry
+from shapely.geometry.polygon import orient
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+from pyproj import CRS, Transformer
+
+from validation import is_wgs84
 
 
 GITHUB_RIBBON = (
@@ -34,55 +41,331 @@ GITHUB_RIBBON = (
 )
 
 
+ARROW_SUFFIXES = [".parquet", ".geoparquet", ".arrow", ".feather", ".ipc"]
+
+
+def _local_path(uploaded_file: BinaryIO) -> Optional[Path]:
+    """
+    The path of an opened local file, which can then be read by path (e.g.
+    memory-mapped) instead of via the file object.
+    """
+    if isinstance(uploaded_file, (BufferedReader, FileIO)):
+        path = Path(uploaded_file.name)
+        if path.is_file():
+            return path
+    return None
+
+
+def _open_arrow_source(uploaded_file: BinaryIO) -> pa.NativeFile:
+    """
+    Local files are memory-mapped, in-memory uploads are wrapped without a copy.
+    """
+    path = _local_path(uploaded_file)
+    if path is not None:
+        return pa.memory_map(str(path))
+    if hasattr(uploaded_file, "getbuffer"):
+        return pa.BufferReader(pa.py_buffer(uploaded_file.getbuffer()))
+    return pa.BufferReader(uploaded_file.read())
+
+
+def _open_ipc(source: pa.NativeFile) -> pa.RecordBatchReader:
+    """
+    Reader of the record batches of an Arrow IPC file or stream.
+    """
+    try:
+        ipc_file = pa.ipc.open_file(source)
+        return pa.RecordBatchReader.from_batches(
+            ipc_file.schema,
+            (ipc_file.get_batch(i) for i in range(ipc_file.num_record_batches)),
+        )
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source)
+
+
+def read_arrow_file_to_df(uploaded_file: BinaryIO) -> GeoDataFrame:
+    """
+    Reads GeoParquet and Arrow IPC/Feather files. The geometries, as WKB or native
+    GeoArrow encoding, are decoded in bulk.
+
+    Args:
+        uploaded_file: A single bytesIO like object with a name attribute, e.g. the
+            Streamlit UploadedFile or an opened file.
+
+    Returns:
+        Geopandas dataframe
+    """
+    source = _open_arrow_source(uploaded_file)
+    if Path(uploaded_file.name).suffix in (".parquet", ".geoparquet"):
+        table = pq.read_table(source)
+    else:
+        table = _open_ipc(source).read_all()
+    return GeoDataFrame.from_arrow(table)
+
+
 def read_vector_file_to_df(
-    uploaded_file: st.uploaded_file_manager.UploadedFile,
+    uploaded_file: BinaryIO,
 ) -> Union[GeoDataFrame, None]:
     """
 
     Args:
-        uploaded_file: A single bytesIO like object
+        uploaded_file: A single bytesIO like object with a name attribute, e.g. the
+            Streamlit UploadedFile or an opened file.
 
     Returns:
         Geopandas dataframe
     """
     filename = uploaded_file.name
     suffix = Path(filename).suffix
-    if suffix == ".kml":
-        # st.info("Reading KML file ...")
-        gpd.io.file.fiona.drvsupport.supported_drivers["KML"] = "rw"
-        df = gpd.read_file(uploaded_file, driver="KML")
-    elif suffix == ".wkt":
+    if suffix == ".wkt":
         # st.info("Reading WKT file ...")
         wkt_string = uploaded_file.read().decode("utf-8")
         df = pd.DataFrame({"geometry": [wkt_string]})
         df["geometry"] = df["geometry"].apply(shapely.wkt.loads)
         df = gpd.GeoDataFrame(df, geometry="geometry", crs=4326)
-    elif suffix == ".zip":
-        # st.info("Reading zipped Shapefile ...")
-        with (ZipMemoryFile(uploaded_file)) as memfile:
-            with memfile.open() as src:
-                crs = src.crs
-                df = gpd.GeoDataFrame.from_features(src, crs=crs)
-                if df.crs is None:
-                    st.error("The provided shapefile has no crs!")
-                    st.stop()
+    elif suffix in ARROW_SUFFIXES:
+        # st.info("Reading GeoParquet/Arrow file ...")
+        df = read_arrow_file_to_df(uploaded_file)
     else:
-        # st.info("Reading GeoJSON/JSON file ...")
-        df = gpd.read_file(uploaded_file)  # Geojson etc.
+        # st.info("Reading GeoJSON/JSON, KML, FlatGeobuf or zipped Shapefile ...")
+        # GDAL reads the features into Arrow batches, local files directly by path.
+        path = _local_path(uploaded_file)
+        df = pyogrio.read_dataframe(
+            str(path) if path is not None else uploaded_file, use_arrow=True
+        )
+        if suffix == ".zip" and df.crs is None:
+            raise ValueError("The provided shapefile has no crs!")
+
+    return df
+
+
+def read_vector_file_in_chunks(path: Path, chunk_size: int) -> Iterator[GeoDataFrame]:
+    """
+    Reads a vector file in Arrow record batches and yields dataframes of chunk_size
+    features, so the full file is never held in memory.
+
+    Args:
+        path: Path of a GeoJSON/JSON, KML, WKT, FlatGeobuf, GeoParquet, Arrow or
+            zipped SHAPEFILE file.
+        chunk_size: Maximum number of features per yielded dataframe.
+
+    Returns:
+        Iterator of geopandas dataframes
+    """
+    suffix = path.suffix
+    if suffix == ".wkt":
+        # A WKT file holds a single geometry.
+        with open(path, "rb") as f:
+            yield read_vector_file_to_df(f)
+        return
+
+    offset = 0
+    if suffix in ARROW_SUFFIXES:
+        source = pa.memory_map(str(path))
+        if suffix in (".parquet", ".geoparquet"):
+            parquet_file = pq.ParquetFile(source)
+            schema = parquet_file.schema_arrow
+            batches = parquet_file.iter_batches(batch_size=chunk_size)
+        else:
+            reader = _open_ipc(source)
+            schema = reader.schema
+            batches = _rebatch(reader, chunk_size)
+        for batch in batches:
+            table = pa.Table.from_batches([batch], schema=schema)
+            yield _table_to_df(table, offset)
+            offset += table.num_rows
+        return
+
+    with pyogrio.open_arrow(path, batch_size=chunk_size, use_pyarrow=True) as (
+        meta,
+        reader,
+    ):
+        if suffix == ".zip" and not meta["crs"]:
+            raise ValueError("The provided shapefile has no crs!")
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            yield _table_to_df(table, offset, crs=meta["crs"])
+            offset += table.num_rows
+
 
+def _rebatch(
+    reader: pa.RecordBatchReader, chunk_size: int
+) -> Iterator[pa.RecordBatch]:
+    """
+    Splits the record batches of an IPC file into batches of at most chunk_size.
+    """
+    for batch in reader:
+        for start in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(start, chunk_size)
+
+
+def _table_to_df(table: pa.Table, offset: int, crs=None) -> GeoDataFrame:
+    df = GeoDataFrame.from_arrow(table)
+    if df.geometry.name != "geometry":
+        # GDAL names the geometry column e.g. "wkb_geometry".
+        df = df.rename_geometry("geometry")
+    if crs is not None and df.crs is None:
+        df = df.set_crs(crs)
+    # Continuous index across the chunks, as for the completely read file.
+    df.index = pd.RangeIndex(offset, offset + len(df))
     return df
 
 
+# GeoJSON type names of the geometry types with a shapely ragged array encoding.
+GEOJSON_RAGGED_TYPES = {
+    shapely.GeometryType.POINT: "Point",
+    shapely.GeometryType.LINESTRING: "LineString",
+    shapely.GeometryType.POLYGON: "Polygon",
+    shapely.GeometryType.MULTIPOINT: "MultiPoint",
+    shapely.GeometryType.MULTILINESTRING: "MultiLineString",
+    shapely.GeometryType.MULTIPOLYGON: "MultiPolygon",
+}
+# Minimum number of coordinates per line or ring.
+GEOJSON_MIN_COORDINATES = {
+    "LineString": 2,
+    "MultiLineString": 2,
+    "Polygon": 4,
+    "MultiPolygon": 4,
+}
+# Nesting depth of the coordinates below the geometry level per GeoJSON type.
+GEOJSON_COORDINATE_DEPTH = {
+    "Point": 0,
+    "LineString": 1,
+    "MultiPoint": 1,
+    "Polygon": 2,
+    "MultiLineString": 2,
+    "MultiPolygon": 3,
+}
+
+
+def _ragged_coordinates(
+    coordinates: List, depth: int
+) -> Tuple[np.ndarray, Tuple[np.ndarray, ...]]:
+    """
+    Flattens nested GeoJSON coordinate lists of one geometry type into a coordinate
+    array and the offsets per nesting level, as used by shapely.from_ragged_array.
+    """
+    offsets = []
+    for _ in range(depth):
+        lengths = np.fromiter(map(len, coordinates), np.int64, len(coordinates))
+        offsets.append(np.r_[0, np.cumsum(lengths)])
+        coordinates = list(chain.from_iterable(coordinates))
+    dims = np.fromiter(map(len, coordinates), np.int64, len(coordinates))
+    if len(dims) and (dims.min() != dims.max() or dims[0] not in (2, 3)):
+        raise ValueError("Mixed or invalid coordinate dimensions!")
+    n_dims = dims[0] if len(dims) else 2
+    flat = np.fromiter(chain.from_iterable(coordinates), np.float64, dims.sum())
+    return flat.reshape(-1, n_dims), tuple(reversed(offsets))
+
+
+def _is_regular(geometry_type: str, offsets: Tuple[np.ndarray, ...]) -> bool:
+    """
+    Whether the ragged offsets of a GeoJSON type have no empty parts or rings and
+    enough coordinates per line and ring. shapely.from_ragged_array does not check
+    this and crashes on empty parts.
+    """
+    for level, level_offsets in enumerate(offsets):
+        minimum = GEOJSON_MIN_COORDINATES.get(geometry_type, 1) if level == 0 else 1
+        lengths = np.diff(level_offsets)
+        if len(lengths) and lengths.min() < minimum:
+            return False
+    return True
+
+
+def _shape(geometry: Dict) -> BaseGeometry:
+    """
+    Builds a single shapely geometry, for the geometries that can not be built in
+    bulk. Empty geometries are allowed, empty parts or rings and too short lines or
+    rings are not.
+
+    Raises:
+        ValueError: The geometry is malformed.
+    """
+    try:
+        geometry_type = geometry["type"]
+        if geometry_type in GEOJSON_COORDINATE_DEPTH and geometry["coordinates"]:
+            _, offsets = _ragged_coordinates(
+                [geometry["coordinates"]], GEOJSON_COORDINATE_DEPTH[geometry_type]
+            )
+            if not _is_regular(geometry_type, offsets):
+                raise ValueError("Empty parts or rings, or too few coordinates!")
+        return shape(geometry)
+    except (
+        KeyError,
+        TypeError,
+        IndexError,
+        ValueError,
+        shapely.errors.ShapelyError,
+    ) as e:
+        raise ValueError(f"Invalid geometry {str(geometry)[:100]}: {e}") from e
+
+
+def geometries_from_geojson(geometries: List[Union[Dict, None]]) -> np.ndarray:
+    """
+    Builds shapely geometries from GeoJSON geometry dicts in bulk. The coordinates
+    of each geometry type are flattened into one array and converted at once via
+    shapely.from_ragged_array, only GeometryCollections and irregular coordinates
+    are converted one by one.
+
+    Args:
+        geometries: GeoJSON geometry dicts, None for missing geometries.
+
+    Returns:
+        Array of shapely geometries.
+
+    Raises:
+        ValueError: A geometry is malformed, e.g. has empty parts or rings.
+    """
+    result = np.full(len(geometries), None, dtype=object)
+    try:
+        types = np.array([g["type"] if g else "" for g in geometries])
+    except (KeyError, TypeError) as e:
+        raise ValueError("Each geometry needs a type!") from e
+    for geometry_type in np.unique(types):
+        if not geometry_type:
+            continue
+        positions = np.flatnonzero(types == geometry_type)
+        try:
+            coords, offsets = _ragged_coordinates(
+                [geometries[i]["coordinates"] for i in positions],
+                GEOJSON_COORDINATE_DEPTH[geometry_type],
+            )
+            if not _is_regular(geometry_type, offsets):
+                raise ValueError("Irregular offsets")
+            result[positions] = shapely.from_ragged_array(
+                shapely.GeometryType[geometry_type.upper()], coords, offsets or None
+            )
+        except (KeyError, TypeError, ValueError):
+            result[positions] = [_shape(geometries[i]) for i in positions]
+    return result
+
+
 def read_json_string_to_df(json_string: str) -> GeoDataFrame:
-    geom_json = geojson.loads(json_string.replace("'", '"'))
+    """
+    Reads a pasted FeatureCollection, Feature, Geometry, Polygon coordinates or
+    bbox. The geometries are built in bulk per geometry type, the properties
+    column-wise.
+
+    Args:
+        json_string: The pasted text, JSON or Python dict notation.
+
+    Returns:
+        Geopandas dataframe
+    """
+    try:
+        geom_json = orjson.loads(json_string)
+    except orjson.JSONDecodeError:
+        # Python dict notation with single quotes.
+        geom_json = orjson.loads(json_string.replace("'", '"'))
+    features = None
     if isinstance(geom_json, dict):
-        if geom_json["type"] == "FeatureCollection":
+        if geom_json.get("type") == "FeatureCollection":
             # st.info("Reading FeatureCollection ...")
-            fc = geom_json
-        if geom_json["type"] == "Feature":
+            features = geom_json.get("features")
+        elif geom_json.get("type") == "Feature":
             # st.info("Reading Feature ...")
-            fc = FeatureCollection(features=[geom_json])
-        elif geom_json["type"] in [
+            features = [geom_json]
+        elif geom_json.get("type") in [
             "Polygon",
             "MultiPolygon",
             "Point",
@@ -92,135 +375,363 @@ def read_json_string_to_df(json_string: str) -> GeoDataFrame:
             "LinearRing",
         ]:
             # st.info("Reading Geometry ...")
-            fc = FeatureCollection([Feature(geometry=geom_json)])
-    elif isinstance(geom_json, list):
-        if len(geom_json) == 4 and isinstance(geom_json[0], float):
+            features = [{"geometry": geom_json}]
+    elif isinstance(geom_json, list) and geom_json:
+        if len(geom_json) == 4 and all(
+            isinstance(c, (int, float)) for c in geom_json
+        ):
             # st.info("Reading bbox (Polygon) ...")
-            geometry = mapping(box(*geom_json))
-            fc = FeatureCollection([Feature(geometry=geometry)])
-        elif isinstance(geom_json[0], list) and isinstance(geom_json[0][0], list):
+            features = [{"geometry": mapping(box(*geom_json))}]
+        elif (
+            isinstance(geom_json[0], list)
+            and geom_json[0]
+            and isinstance(geom_json[0][0], list)
+        ):
             # st.info("Reading Coordinates (Polygon)...")
-            geometry = {"type": "Polygon", "coordinates": geom_json}
-            fc = FeatureCollection([Feature(geometry=geometry)])
-    else:
-        st.error(
+            features = [{"geometry": {"type": "Polygon", "coordinates": geom_json}}]
+    if not isinstance(features, list) or not all(
+        isinstance(feature, dict) for feature in features
+    ):
+        raise ValueError(
             "Could not read json string! Check missing brackets! Only FeatureCollection, "
             "Feature, Geometry, Coordinates, or bbox are allowed!"
         )
-        st.stop()
-    df = gpd.GeoDataFrame.from_features(fc, crs="EPSG:4326")
-    return df
+
+    properties = pd.DataFrame.from_records(
+        [feature.get("properties") or {} for feature in features],
+        index=pd.RangeIndex(len(features)),
+    ).drop(columns="geometry", errors="ignore")
+    properties.insert(
+        0, "geometry", geometries_from_geojson([f.get("geometry") for f in features])
+    )
+    return gpd.GeoDataFrame(properties, geometry="geometry", crs="EPSG:4326")
 
 
-def close_holes(poly: Polygon) -> Polygon:
+def reduce_for_map(
+    df: GeoDataFrame, figsize: Tuple[int, int], max_features: int, max_points: int
+) -> Tuple[GeoDataFrame, str]:
     """
-    Close polygon holes by limitation to the exterior ring.
+    Level of detail reduction of the dataframe for the map display. Up to
+    max_features, the geometries are simplified to the pixel size of the map extent.
+    Above, the features are shown as centroids, randomly sampled to max_points.
+
     Args:
-        poly: Input shapely Polygon
-    Example:
-        df.geometry.apply(lambda p: close_holes(p))
+        df: Geopandas dataframe
+        figsize: The map width and height in pixels.
+        max_features: Maximum number of features drawn with their geometry.
+        max_points: Maximum number of features drawn as centroids.
+
+    Returns:
+        The reduced dataframe and a description of the display mode.
     """
-    if poly.interiors:
-        return Polygon(list(poly.exterior.coords))
+    geometries = np.asarray(df.geometry.values)
+    if len(df) > max_features:
+        index = np.arange(len(df))
+        mode = "centroids"
+        if len(df) > max_points:
+            rng = np.random.default_rng(0)
+            index = np.sort(rng.choice(len(df), max_points, replace=False))
+            mode = "sampled centroids"
+        map_df = df.iloc[index].copy()
+        reduced = shapely.centroid(geometries[index])
     else:
-        return poly
+        minx, miny, maxx, maxy = shapely.total_bounds(geometries)
+        pixel_size = max((maxx - minx) / figsize[0], (maxy - miny) / figsize[1])
+        if not np.isfinite(pixel_size):
+            pixel_size = 0
+        map_df = df.copy()
+        reduced = shapely.simplify(geometries, pixel_size, preserve_topology=True)
+        mode = "simplified"
+    map_df.geometry = GeoSeries(reduced, index=map_df.index, crs=df.crs)
+    return map_df, mode
 
 
-def download_button(
-    object_to_download,
-    download_filename,
-    button_text,
-    st_element=None,  # , pickle_it=False
-) -> None:
-    """
-    Generates a link to download the given object_to_download.
-
-    From: https://discuss.streamlit.io/t/a-download-button-with-custom-css/4220
-    Params:
-    ------
-    object_to_download:  The object to be downloaded.
-    download_filename (str): filename and extension of file. e.g. mydata.csv,
-    some_txt_output.txt download_link_text (str): Text to display for download
-    link.
-    button_text (str): Text to display on download button (e.g. 'click here to download file')
-    pickle_it (bool): If True, pickle file.
-    Returns:
-    -------
-    (str): the anchor tag to download object_to_download
-    Examples:
-    --------
-    download_link(your_df, 'YOUR_DF.csv', 'Click to download data!')
-    download_link(your_str, 'YOUR_STRING.txt', 'Click to download text!')
-    """
-    # if pickle_it:
-    #     try:
-    #         object_to_download = pickle.dumps(object_to_download)
-    #     except pickle.PicklingError as e:
-    #         st.write(e)
-    #         return None
-
-    # else:
-    #     if isinstance(object_to_download, bytes):
-    #         pass
-
-    #     elif isinstance(object_to_download, pd.DataFrame):
-    #         object_to_download = object_to_download.to_csv(index=False)
-
-    #     # Try JSON encode for everything else
-    #     else:
-    #         object_to_download = json.dumps(object_to_download)
+def truncate_coordinates(geojson_dict: Dict, max_coordinates: int) -> Dict:
+    """
+    Shortens the coordinate arrays of a GeoJSON dictionary for display, longer
+    coordinate sequences are cut and end with a note of the omitted count.
 
-    try:
-        # some strings <-> bytes conversions necessary here
-        b64 = base64.b64encode(object_to_download.encode()).decode()
-    except AttributeError as e:
-        b64 = base64.b64encode(object_to_download).decode()
-
-    button_uuid = str(uuid.uuid4()).replace("-", "")
-    button_id = re.sub("\d+", "", button_uuid)
-
-    custom_css = f""" 
-        <style>
-            #{button_id} {{
-                display: inline-flex;
-                align-items: center;
-                justify-content: center;
-                background-color: rgb(255, 255, 255);
-                color: rgb(38, 39, 48);
-                padding: .25rem .75rem;
-                position: relative;
-                text-decoration: none;
-                border-radius: 4px;
-                border-width: 1px;
-                border-style: solid;
-                border-color: rgb(230, 234, 241);
-                border-image: initial;
-            }} 
-            #{button_id}:hover {{
-                border-color: rgb(246, 51, 102);
-                color: rgb(246, 51, 102);
-            }}
-            #{button_id}:active {{
-                box-shadow: none;
-                background-color: rgb(246, 51, 102);
-                color: white;
-                }}
-        </style> """
-
-    dl_link = (
-        custom_css
-        + f'<a download="{download_filename}" id="{button_id}" href="data:file/txt;base64,{b64}">{button_text}</a><br><br>'
+    Args:
+        geojson_dict: GeoJSON FeatureCollection, Feature or Geometry dictionary.
+        max_coordinates: Maximum number of coordinates kept per sequence.
+    """
+
+    def truncate(value):
+        if isinstance(value, dict):
+            return {
+                k: truncate_sequence(v) if k == "coordinates" else truncate(v)
+                for k, v in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return [truncate(v) for v in value]
+        return value
+
+    def truncate_sequence(coords):
+        if not isinstance(coords, (list, tuple)) or not coords:
+            return coords
+        if not isinstance(coords[0], (list, tuple)):
+            # A single position
+            return list(coords)
+        if len(coords) > max_coordinates and not isinstance(coords[0][0], (list, tuple)):
+            omitted = len(coords) - max_coordinates
+            return [list(c) for c in coords[:max_coordinates]] + [
+                f"... {omitted} more"
+            ]
+        return [truncate_sequence(c) for c in coords]
+
+    return truncate(geojson_dict)
+
+
+# Features per serialized chunk of the GeoJSON writer.
+GEOJSON_CHUNK_SIZE = 10_000
+_NUMPY = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _json_default(obj):
+    # Missing values that orjson does not serialize by itself, e.g. NaT.
+    if pd.isna(obj):
+        return None
+    return str(obj)
+
+
+def _nest(parts: List[bytes], offsets: np.ndarray) -> List[bytes]:
+    return [
+        b"[" + b",".join(parts[start:end]) + b"]"
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def _geometries_to_json(
+    geometries: np.ndarray, precision: Optional[int] = None
+) -> List[bytes]:
+    """
+    Serializes shapely geometries to GeoJSON geometry objects. The coordinates of
+    each geometry type are taken from the flat ragged array and written per ring or
+    line at once, only the nesting is assembled per ring.
+    """
+    result = [b"null"] * len(geometries)
+    # Empty geometries are written as null, as by __geo_interface__.
+    type_ids = np.where(shapely.is_empty(geometries), -1, shapely.get_type_id(geometries))
+    has_z = shapely.has_z(geometries)
+    for type_id, z in set(zip(type_ids.tolist(), has_z.tolist())):
+        if type_id < 0:
+            continue
+        geometry_type = shapely.GeometryType(type_id)
+        positions = np.flatnonzero((type_ids == type_id) & (has_z == z))
+        if geometry_type in GEOJSON_RAGGED_TYPES:
+            _, coords, offsets = shapely.to_ragged_array(
+                geometries[positions], include_z=z
+            )
+            if precision is not None:
+                coords = np.round(coords, precision)
+            if not offsets:
+                coordinates = [orjson.dumps(c, option=_NUMPY) for c in coords]
+            else:
+                bounds = offsets[0].tolist()
+                coordinates = [
+                    orjson.dumps(coords[start:end], option=_NUMPY)
+                    for start, end in zip(bounds[:-1], bounds[1:])
+                ]
+                for level_offsets in offsets[1:]:
+                    coordinates = _nest(coordinates, level_offsets)
+            name = GEOJSON_RAGGED_TYPES[geometry_type].encode()
+            prefix = b'{"type":"%s","coordinates":' % name
+            for position, coordinate in zip(positions.tolist(), coordinates):
+                result[position] = prefix + coordinate + b"}"
+        else:
+            # GeometryCollections and LinearRings have no ragged array encoding.
+            for position in positions.tolist():
+                geometry = geometries[position]
+                if precision is not None:
+                    geometry = shapely.set_precision(geometry, 10**-precision)
+                result[position] = orjson.dumps(mapping(geometry))
+    return result
+
+
+@lru_cache(maxsize=32)
+def get_wgs84_transformer(crs: CRS) -> Transformer:
+    """
+    Transformer from the crs to WGS84 longitude/latitude, cached per source crs
+    across runs.
+    """
+    return Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+
+
+def to_wgs84(df: GeoDataFrame) -> GeoDataFrame:
+    """
+    Reprojects the dataframe to WGS84 longitude/latitude. The coordinates of all
+    geometries are transformed at once over the flat coordinate array.
+
+    Args:
+        df: Geopandas dataframe with a crs.
+    """
+    transformer = get_wgs84_transformer(CRS.from_user_input(df.crs))
+
+    def transform(coordinates: np.ndarray) -> np.ndarray:
+        # Padded by one coordinate, pyproj transforms a single coordinate as a
+        # scalar point.
+        columns = np.concatenate([coordinates, coordinates[:1]]).T.copy()
+        transformer.transform(*columns, inplace=True)
+        return columns[:, : len(coordinates)].T
+
+    geometries = shapely.transform(
+        np.asarray(df.geometry.values), transform, include_z=None
     )
-    # dl_link = f'<a download="{download_filename}" id="{button_id}" href="data:file/txt;base64,{b64}"><input type="button" kind="primary" value="{button_text}"></a><br></br>'
+    df = df.copy()
+    df.geometry = GeoSeries(geometries, index=df.index, crs="EPSG:4326")
+    return df
+
 
-    if st_element is not None:
-        st_element.markdown(dl_link, unsafe_allow_html=True)
+def iter_geojson_features(
+    df: GeoDataFrame,
+    precision: Optional[int] = None,
+    rfc7946: bool = False,
+    chunk_size: int = GEOJSON_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Serializes the features of the dataframe to GeoJSON in chunks, each chunk is
+    the comma separated Feature objects of chunk_size rows.
+
+    Args:
+        df: Geopandas dataframe
+        precision: Number of decimals of the coordinates, None keeps all.
+        rfc7946: Make the output RFC 7946 compliant: Reprojected to EPSG:4326,
+            exterior rings counterclockwise and interior rings clockwise.
+        chunk_size: Number of features per yielded chunk.
+    """
+    if rfc7946 and not is_wgs84(df.crs):
+        df = to_wgs84(df)
+    properties = df.drop(columns=df.geometry.name)
+    ids = df.index.astype(str)
+
+    for start in range(0, len(df), chunk_size):
+        end = min(start + chunk_size, len(df))
+        geometries = np.asarray(df.geometry.values[start:end])
+        if rfc7946:
+            geometries = shapely.orient_polygons(geometries, exterior_cw=False)
+        geometry_json = _geometries_to_json(geometries, precision)
+        # to_dict returns no records at all for a frame without property columns.
+        records = (
+            properties.iloc[start:end].to_dict("records")
+            if len(properties.columns)
+            else [{}] * (end - start)
+        )
+        yield b",".join(
+            b'{"id":'
+            + orjson.dumps(feature_id)
+            + b',"type":"Feature","properties":'
+            + orjson.dumps(record, option=_NUMPY, default=_json_default)
+            + b',"geometry":'
+            + geometry
+            + b"}"
+            for feature_id, record, geometry in zip(
+                ids[start:end], records, geometry_json
+            )
+        )
+
+
+def iter_geojson(
+    df: GeoDataFrame,
+    precision: Optional[int] = None,
+    rfc7946: bool = False,
+    chunk_size: int = GEOJSON_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Serializes the dataframe to a GeoJSON FeatureCollection in chunks of features,
+    so the memory use does not grow with the size of the output. See
+    iter_geojson_features for the arguments.
+
+    Returns:
+        Iterator of the bytes of the GeoJSON text.
+    """
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    for features in iter_geojson_features(df, precision, rfc7946, chunk_size):
+        yield separator + features
+        separator = b","
+    yield b"]}"
+
+
+def write_df_to_bytes(
+    df: GeoDataFrame,
+    output_format: str,
+    precision: Optional[int] = None,
+    rfc7946: bool = False,
+) -> bytes:
+    """
+    Serializes the dataframe to the file content of the output format.
+
+    Args:
+        df: Geopandas dataframe
+        output_format: One of "GeoJSON", "GeoJSON (gzip)", "GeoParquet", "FlatGeobuf"
+        precision: Number of decimals of the GeoJSON coordinates, None keeps all.
+        rfc7946: Make the GeoJSON output RFC 7946 compliant, see iter_geojson.
+    """
+    if output_format == "GeoJSON":
+        return b"".join(iter_geojson(df, precision, rfc7946))
+    elif output_format == "GeoJSON (gzip)":
+        compressor = zlib.compressobj(wbits=31)
+        chunks = [
+            compressor.compress(chunk) for chunk in iter_geojson(df, precision, rfc7946)
+        ]
+        return b"".join(chunks) + compressor.flush()
+    elif output_format == "GeoParquet":
+        buffer = BytesIO()
+        df.to_parquet(buffer)
+        return buffer.getvalue()
+    elif output_format == "FlatGeobuf":
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "output.fgb"
+            df.to_file(path, driver="FlatGeobuf")
+            return path.read_bytes()
+    raise ValueError(f"Output format {output_format} is not supported!")
+
+
+def write_report_to_bytes(report: pd.DataFrame, output_format: str) -> bytes:
+    """
+    Serializes the feature report to the file content of the output format.
+
+    Args:
+        report: The feature report, see validation.feature_report.
+        output_format: One of "CSV", "Parquet"
+    """
+    if output_format == "CSV":
+        return report.to_csv(index=False).encode()
+    elif output_format == "Parquet":
+        buffer = BytesIO()
+        report.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Report format {output_format} is not supported!")
+
+
+def close_holes(poly: Union[Polygon, MultiPolygon]) -> Union[Polygon, MultiPolygon]:
+    """
+    Close polygon holes by limitation to the exterior ring.
+    Args:
+        poly: Input shapely Polygon or MultiPolygon
+    Example:
+        df.geometry.apply(lambda p: close_holes(p))
+    """
+    if poly.geom_type == "MultiPolygon":
+        return MultiPolygon([close_holes(p) for p in poly.geoms])
+    if poly.geom_type == "Polygon" and poly.interiors:
+        return Polygon(poly.exterior)
     else:
-        st.markdown(dl_link, unsafe_allow_html=True)
+        return poly
 
 
-def load_lottieurl(url: str) -> Dict:
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+def orient_ccw(poly: Union[Polygon, MultiPolygon]) -> Union[Polygon, MultiPolygon]:
+    """
+    Applies the right-hand rule, exterior rings counterclockwise and interior rings
+    clockwise. Other geometry types are returned unchanged.
+    Args:
+        poly: Input shapely Polygon or MultiPolygon
+    Example:
+        df.geometry.apply(lambda p: orient_ccw(p))
+    """
+    if poly.geom_type == "MultiPolygon":
+        return MultiPolygon([orient(p) for p in poly.geoms])
+    if poly.geom_type == "Polygon":
+        return orient(poly)
+    else:
+        return poly
@@ -1,6 +1,684 @@
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+import os
+from typing import Callable, Iterator, List, Optional, Union, Dict, Tuple
 
+import numpy as np
+import pandas as pd
+import shapely
 from geopandas import GeoDataFrame
+from pyproj import CRS
+from shapely.geometry.base import BaseGeometry
+
+
+VALIDATION_CRITERIA = [
+    "No Self-Intersection",
+    "No Holes",
+    "Counterclockwise",
+]
+ADDITIONAL_VALIDATION_CRITERIA = [
+    "No Duplicated Vertices",
+    "No Overlaps",
+    "WGS84 / RFC 7946",
+    "Coordinate Precision",
+]
+# Maps the user facing validation criteria to the Vector flag attributes.
+CRITERIA_FLAGS = {
+    "No Self-Intersection": "is_no_selfintersection",
+    "No Holes": "is_no_holes",
+    "Counterclockwise": "is_ccw",
+    "No Duplicated Vertices": "is_no_duplicated_vertices",
+    "No Overlaps": "is_no_overlaps",
+    "WGS84 / RFC 7946": "is_4326",
+    "Coordinate Precision": "is_precise",
+}
+# Criteria that depend on the other features, not only on the feature itself.
+INTER_FEATURE_CRITERIA = ["No Overlaps"]
+# Minimum number of coordinates per line or ring, by geometry type with linework.
+LINEWORK_MIN_COORDS = {
+    shapely.GeometryType.LINESTRING: 2,
+    shapely.GeometryType.MULTILINESTRING: 2,
+    shapely.GeometryType.POLYGON: 4,
+    shapely.GeometryType.MULTIPOLYGON: 4,
+}
+# Longitude/latitude bounds of WGS84 coordinates.
+WGS84_BOUNDS = (-180.0, -90.0, 180.0, 90.0)
+# Grid the coordinates are snapped to by the "Coordinate Precision" fix, in degrees
+# for geographic crs. The default is about 1 cm.
+COORDINATE_GRID_SIZE = float(os.environ.get("VECTOR_VALIDATOR_GRID_SIZE", 1e-7))
+# The grid in metres for projected crs, converted to the units of the crs.
+PROJECTED_GRID_SIZE = float(
+    os.environ.get("VECTOR_VALIDATOR_PROJECTED_GRID_SIZE", 0.01)
+)
+# Vertices with a sine of the angle between their segments below this are collinear.
+COLLINEAR_TOLERANCE = 1e-9
+# Overlaps below this share of the smaller feature's area are ignored.
+OVERLAP_MIN_AREA_RATIO = 1e-9
+# Polygons with at least this many vertices are checked on the pieces of a grid in
+# parallel, see is_valid_by_grid.
+LARGE_GEOMETRY_VERTICES = int(
+    os.environ.get("VECTOR_VALIDATOR_LARGE_VERTICES", 500_000)
+)
+# Maximum number of vertices of a grid piece.
+GRID_CELL_VERTICES = 50_000
+# Maximum number of grid refinements, at most 4^6 pieces.
+GRID_MAX_DEPTH = 6
+# Overlap of the grid cells of the checks, as a share of the cell size.
+GRID_CELL_PADDING = 0.01
+
+
+def get_polygon_parts(geometries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Explodes the geometries into their single Polygon parts.
+
+    Args:
+        geometries: Array of shapely geometries.
+
+    Returns:
+        The Polygon parts and for each part the index of its source geometry.
+    """
+    parts, part_index = shapely.get_parts(geometries, return_index=True)
+    is_polygon = shapely.get_type_id(parts) == shapely.GeometryType.POLYGON
+    return parts[is_polygon], part_index[is_polygon]
+
+
+def get_ring_signed_area(rings: np.ndarray) -> np.ndarray:
+    """
+    Signed ring area via the shoelace formula over the flat coordinate array.
+    Positive for counterclockwise, negative for clockwise rings.
+
+    Args:
+        rings: Array of shapely LinearRings.
+    """
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    x, y = coords[:, 0], coords[:, 1]
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    # Skip the segments connecting the last vertex of a ring with the next ring.
+    same_ring = ring_index[:-1] == ring_index[1:]
+    return (
+        np.bincount(
+            ring_index[:-1][same_ring],
+            weights=cross[same_ring],
+            minlength=len(rings),
+        )
+        / 2
+    )
+
+
+def find_large_geometries(
+    geometries: np.ndarray, min_vertices: int = LARGE_GEOMETRY_VERTICES
+) -> np.ndarray:
+    """
+    Polygons and MultiPolygons with at least min_vertices vertices, these are
+    checked on the pieces of a grid and repaired in parallel. None on a single CPU,
+    where the grid only adds the clipping.
+    """
+    if (os.cpu_count() or 1) == 1:
+        return np.zeros(len(geometries), dtype=bool)
+    is_polygonal = np.isin(
+        shapely.get_type_id(geometries),
+        [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON],
+    )
+    return is_polygonal & (shapely.get_num_coordinates(geometries) >= min_vertices)
+
+
+def split_by_grid(
+    geometry: BaseGeometry,
+    cell_vertices: int = GRID_CELL_VERTICES,
+    padding: float = 0.0,
+    workers: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Splits a geometry by a regular grid over its bounding box. The grid is refined
+    level by level, each piece is split into its quadrants, until every piece has
+    at most cell_vertices vertices. Empty pieces are dropped.
+
+    Args:
+        geometry: Shapely geometry.
+        cell_vertices: Maximum number of vertices of a piece.
+        padding: Overlap of the neighbouring cells as a share of the cell size.
+        workers: Number of threads clipping the pieces, defaults to the number of
+            CPUs.
+
+    Returns:
+        Array of the pieces.
+    """
+    pieces = np.array([geometry], dtype=object)
+    xmin, ymin, xmax, ymax = shapely.bounds(geometry)
+    if xmin == xmax or ymin == ymax:
+        return pieces
+    # Column and row of each piece in the grid of the current level.
+    column, row = np.zeros(1, dtype=int), np.zeros(1, dtype=int)
+    for level in range(1, GRID_MAX_DEPTH + 1):
+        if shapely.get_num_coordinates(pieces).max() <= cell_vertices:
+            break
+        xs = np.linspace(xmin, xmax, 2**level + 1)
+        ys = np.linspace(ymin, ymax, 2**level + 1)
+        pad_x, pad_y = padding * (xs[1] - xs[0]), padding * (ys[1] - ys[0])
+        column = (2 * column[:, None] + [0, 1, 0, 1]).ravel()
+        row = (2 * row[:, None] + [0, 0, 1, 1]).ravel()
+        with ThreadPoolExecutor(workers or os.cpu_count() or 1) as executor:
+            pieces = np.array(
+                list(
+                    executor.map(
+                        shapely.clip_by_rect,
+                        np.repeat(pieces, 4),
+                        xs[column] - pad_x,
+                        ys[row] - pad_y,
+                        xs[column + 1] + pad_x,
+                        ys[row + 1] + pad_y,
+                    )
+                ),
+                dtype=object,
+            )
+        is_kept = ~shapely.is_empty(pieces)
+        pieces, column, row = pieces[is_kept], column[is_kept], row[is_kept]
+    return pieces
+
+
+def map_threaded(
+    func: Callable[[np.ndarray], np.ndarray],
+    geometries: np.ndarray,
+    workers: Optional[int] = None,
+    chunks: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Applies a vectorized function to chunks of the geometry array in a pool of
+    threads, shapely releases the GIL while it runs.
+
+    Args:
+        func: Function of an array of geometries, returning an array of the same
+            length.
+        geometries: Array of shapely geometries.
+        workers: Number of threads, defaults to the number of CPUs.
+        chunks: Number of chunks, defaults to four per thread as the geometries
+            differ in size.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(geometries))
+    if workers <= 1:
+        return func(geometries)
+    chunks = min(chunks or workers * 4, len(geometries))
+    with ThreadPoolExecutor(workers) as executor:
+        return np.concatenate(
+            list(executor.map(func, np.array_split(geometries, chunks)))
+        )
+
+
+def is_valid_by_grid(
+    geometry: BaseGeometry, workers: Optional[int] = None
+) -> bool:
+    """
+    Validity of a large Polygon or MultiPolygon, checked on the pieces of a grid
+    in parallel. The cells overlap, an intersection on a cell border is within the
+    neighbouring cell. The interior rings are checked against their exterior ring
+    over the whole geometry, as a piece only contains the rings within its cell.
+    An invalid piece is confirmed on the whole geometry, where the check stops at
+    the first invalidity.
+    """
+    pieces = split_by_grid(geometry, padding=GRID_CELL_PADDING, workers=workers)
+    if not map_threaded(shapely.is_valid, pieces, workers).all():
+        return bool(shapely.is_valid(geometry))
+    parts = shapely.get_parts(geometry)
+    rings, ring_part_index = shapely.get_rings(parts, return_index=True)
+    is_hole = np.zeros(len(rings), dtype=bool)
+    is_hole[1:] = ring_part_index[1:] == ring_part_index[:-1]
+    if not is_hole.any():
+        return True
+    shells = shapely.polygons(shapely.get_exterior_ring(parts))
+    shapely.prepare(shells)
+    return bool(
+        shapely.covers(shells[ring_part_index[is_hole]], rings[is_hole]).all()
+    )
+
+
+def check_no_selfintersection(geometries: np.ndarray) -> np.ndarray:
+    """
+    The large geometries are checked on the pieces of a grid, see
+    is_valid_by_grid. Missing geometries are valid, as in the other checks.
+    """
+    is_large = find_large_geometries(geometries)
+    is_valid = np.empty(len(geometries), dtype=bool)
+    small = geometries[~is_large]
+    is_valid[~is_large] = shapely.is_valid(small) | shapely.is_missing(small)
+    is_valid[is_large] = [is_valid_by_grid(g) for g in geometries[is_large]]
+    return is_valid
+
+
+def check_no_holes(
+    geometries: np.ndarray, parts: np.ndarray, part_index: np.ndarray
+) -> np.ndarray:
+    is_valid = np.ones(len(geometries), dtype=bool)
+    has_holes = shapely.get_num_interior_rings(parts) > 0
+    is_valid[part_index[has_holes]] = False
+    return is_valid
+
+
+def check_ccw(
+    geometries: np.ndarray, parts: np.ndarray, part_index: np.ndarray
+) -> np.ndarray:
+    """
+    Right-hand rule (RFC 7946): Exterior rings counterclockwise, interior rings
+    clockwise. Rings without area have no orientation and are not flagged.
+    """
+    is_valid = np.ones(len(geometries), dtype=bool)
+    rings, ring_part_index = shapely.get_rings(parts, return_index=True)
+    if not len(rings):
+        return is_valid
+    # get_rings returns the exterior ring first for each polygon part.
+    is_exterior = np.r_[True, ring_part_index[1:] != ring_part_index[:-1]]
+    area = get_ring_signed_area(rings)
+    is_wrong_winding = np.where(is_exterior, area < 0, area > 0)
+    is_valid[part_index[ring_part_index[is_wrong_winding]]] = False
+    return is_valid
+
+
+def get_position_in_group(group_index: np.ndarray) -> np.ndarray:
+    """
+    Position of each element within its group, for sorted group indices.
+    E.g. [0, 0, 1, 1, 1] -> [0, 1, 0, 1, 2]
+    """
+    return np.arange(len(group_index)) - np.searchsorted(group_index, group_index)
+
+
+def find_duplicated_vertices(
+    geometries: np.ndarray, tolerance: float = 0.0
+) -> pd.DataFrame:
+    """
+    Finds duplicated vertices within each ring of all Polygon and MultiPolygon
+    parts. The closing vertex of a ring is ignored.
+
+    Args:
+        geometries: Array of shapely geometries.
+        tolerance: If > 0, vertices snapping to the same cell of a grid with this
+            cell size are considered duplicates as well.
+
+    Returns:
+        One row per affected vertex with the feature index, the part index within
+        the feature, the ring index within the part (0 is the exterior), the vertex
+        index within the ring and the vertex coordinates.
+    """
+    parts, part_index = get_polygon_parts(geometries)
+    rings, ring_part_index = shapely.get_rings(parts, return_index=True)
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    vertex_position = get_position_in_group(ring_index)
+
+    is_closing = np.r_[ring_index[1:] != ring_index[:-1], True]
+    candidates = np.flatnonzero(~is_closing)
+    keys = coords[candidates]
+    if tolerance > 0:
+        keys = np.floor(keys / tolerance + 0.5)
+    order = np.lexsort((keys[:, 1], keys[:, 0], ring_index[candidates]))
+    keys, ring_sorted = keys[order], ring_index[candidates][order]
+    is_same = (ring_sorted[1:] == ring_sorted[:-1]) & np.all(
+        keys[1:] == keys[:-1], axis=1
+    )
+    is_duplicated = np.zeros(len(candidates), dtype=bool)
+    is_duplicated[order[1:][is_same]] = True
+    is_duplicated[order[:-1][is_same]] = True
+    duplicates = candidates[is_duplicated]
+
+    ring_idx = ring_index[duplicates]
+    part_idx = ring_part_index[ring_idx]
+    return pd.DataFrame(
+        {
+            "feature": part_index[part_idx],
+            "part": get_position_in_group(part_index)[part_idx],
+            "ring": get_position_in_group(ring_part_index)[ring_idx],
+            "vertex": vertex_position[duplicates],
+            "x": coords[duplicates, 0],
+            "y": coords[duplicates, 1],
+        }
+    )
+
+
+def check_no_duplicated_vertices(
+    geometries: np.ndarray, tolerance: float = 0.0
+) -> np.ndarray:
+    is_valid = np.ones(len(geometries), dtype=bool)
+    duplicates = find_duplicated_vertices(geometries, tolerance)
+    is_valid[duplicates["feature"].to_numpy()] = False
+    return is_valid
+
+
+def find_redundant_vertices(
+    coords: np.ndarray, offsets: np.ndarray, min_coords: int
+) -> np.ndarray:
+    """
+    Finds the vertices that lie on the straight line between their neighbours and
+    continue in the same direction, including repeated vertices. The first and last
+    vertex of each line or ring are kept, lines or rings with redundant vertices are
+    not reduced below min_coords.
+
+    Args:
+        coords: The flat coordinate array of the lines or rings.
+        offsets: The start of each line or ring in coords and the end of the last,
+            as the first offsets of shapely.to_ragged_array.
+        min_coords: Minimum number of coordinates of a line or ring, 4 for rings.
+
+    Returns:
+        Boolean mask of the redundant vertices in coords.
+    """
+    is_redundant = np.zeros(len(coords), dtype=bool)
+    if len(coords) < 3:
+        return is_redundant
+    segments = np.diff(coords[:, :2], axis=0)
+    before, after = segments[:-1], segments[1:]
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    dot = before[:, 0] * after[:, 0] + before[:, 1] * after[:, 1]
+    squared_length = (before**2).sum(axis=1) * (after**2).sum(axis=1)
+    is_redundant[1:-1] = (cross**2 <= COLLINEAR_TOLERANCE**2 * squared_length) & (
+        dot >= 0
+    )
+    is_redundant[offsets[:-1]] = False
+    is_redundant[offsets[1:] - 1] = False
+    if is_redundant.any():
+        n_kept = np.add.reduceat(~is_redundant, offsets[:-1])
+        line_index = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        is_redundant &= (n_kept >= min_coords)[line_index]
+    return is_redundant
+
+
+def iter_ragged_linework(geometries: np.ndarray) -> Iterator[Tuple]:
+    """
+    Iterates over the geometries with lines or rings per geometry type and
+    dimension, as the ragged array of shapely.to_ragged_array. Points and
+    GeometryCollections are skipped.
+
+    Yields:
+        The geometry type, positions of the geometries, coordinates, offsets and the
+        minimum number of coordinates per line or ring.
+    """
+    type_ids = np.where(
+        shapely.is_empty(geometries), -1, shapely.get_type_id(geometries)
+    )
+    has_z = shapely.has_z(geometries)
+    for type_id, z in sorted(set(zip(type_ids.tolist(), has_z.tolist()))):
+        geometry_type = shapely.GeometryType(type_id) if type_id >= 0 else None
+        if geometry_type not in LINEWORK_MIN_COORDS:
+            continue
+        positions = np.flatnonzero((type_ids == type_id) & (has_z == z))
+        _, coords, offsets = shapely.to_ragged_array(
+            geometries[positions], include_z=z
+        )
+        min_coords = LINEWORK_MIN_COORDS[geometry_type]
+        yield geometry_type, positions, coords, offsets, min_coords
+
+
+def grid_size_for_crs(crs=None) -> float:
+    """
+    The grid of the "Coordinate Precision" check and fix in crs units. A missing
+    crs is assumed to be WGS84, as in GeoJSON.
+    """
+    if crs is None:
+        return COORDINATE_GRID_SIZE
+    crs = CRS.from_user_input(crs)
+    if not crs.is_projected or not crs.axis_info:
+        return COORDINATE_GRID_SIZE
+    return PROJECTED_GRID_SIZE / crs.axis_info[0].unit_conversion_factor
+
+
+def check_coordinate_precision(
+    geometries: np.ndarray, grid_size: float = COORDINATE_GRID_SIZE
+) -> np.ndarray:
+    """
+    Valid if all coordinates are on the grid and there are no redundant collinear
+    or repeated vertices, see find_redundant_vertices.
+    """
+    is_valid = np.ones(len(geometries), dtype=bool)
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    snapped = np.round(coords / grid_size) * grid_size
+    # Tolerance for the floating point error of the snapped coordinates, which grows
+    # with the magnitude of the coordinates.
+    tolerance = np.maximum(grid_size * 1e-3, 16 * np.spacing(np.abs(coords)))
+    is_off_grid = (np.abs(coords - snapped) > tolerance).any(axis=1)
+    is_valid[index[is_off_grid]] = False
+
+    for _, positions, coords, offsets, min_coords in iter_ragged_linework(
+        geometries
+    ):
+        is_redundant = find_redundant_vertices(coords, offsets[0], min_coords)
+        # From the vertices up the offset levels to the geometry positions.
+        owner = np.flatnonzero(is_redundant)
+        for level_offsets in offsets:
+            owner = np.searchsorted(level_offsets, owner, side="right") - 1
+        is_valid[positions[owner]] = False
+    return is_valid
+
+
+def make_valid_where_invalid(
+    geometries: np.ndarray, is_valid: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Copy of the geometries where only the invalid ones are replaced by their
+    make_valid version, overlay operations like intersection fail on invalid
+    geometries.
+    """
+    if is_valid is None:
+        is_valid = shapely.is_valid(geometries)
+    geometries = geometries.copy()
+    invalid = ~is_valid & ~shapely.is_missing(geometries)
+    geometries[invalid] = shapely.make_valid(geometries[invalid])
+    return geometries
+
+
+def find_overlaps(
+    geometries: np.ndarray, min_area_ratio: float = OVERLAP_MIN_AREA_RATIO
+) -> pd.DataFrame:
+    """
+    Finds all pairs of features whose interiors intersect, features that just touch
+    are not overlapping. The candidates come from a single bulk STRtree query of the
+    bounding boxes, the predicates and overlap areas are computed vectorized on the
+    candidates only.
+
+    Args:
+        geometries: Array of shapely geometries.
+        min_area_ratio: Overlaps smaller than this share of the smaller feature's
+            area are ignored.
+
+    Returns:
+        One row per overlapping pair with the feature indices (feature < other)
+        and the area of the overlap.
+    """
+    pairs = shapely.STRtree(geometries).query(geometries)
+    pairs = pairs[:, pairs[0] < pairs[1]]
+    shapely.prepare(geometries)
+    a, b = geometries[pairs[0]], geometries[pairs[1]]
+    # For polygons the interiors intersect if one overlaps, contains or is within
+    # the other. Evaluated in stages, each predicate only on the remaining pairs.
+    is_overlap = shapely.overlaps(a, b)
+    for predicate in (shapely.contains, shapely.within):
+        rest = np.flatnonzero(~is_overlap)
+        is_overlap[rest] = predicate(a[rest], b[rest])
+    shapely.destroy_prepared(geometries)
+    pairs = pairs[:, is_overlap]
+
+    involved = np.unique(pairs)
+    valid = geometries.copy()
+    valid[involved] = make_valid_where_invalid(geometries[involved])
+    a, b = valid[pairs[0]], valid[pairs[1]]
+    area = shapely.area(shapely.intersection(a, b))
+    # Overlay results, e.g. of a fixed overlap, are only exact up to floating point
+    # precision and can cross the neighbouring boundary by a rounding error.
+    is_overlap = area > min_area_ratio * np.minimum(shapely.area(a), shapely.area(b))
+    return pd.DataFrame(
+        {
+            "feature": pairs[0][is_overlap],
+            "other": pairs[1][is_overlap],
+            "area": area[is_overlap],
+        }
+    )
+
+
+def find_gaps(
+    geometries: np.ndarray,
+    max_area: float,
+    is_valid: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """
+    Finds gaps between the features, i.e. holes of the union of all features that
+    are smaller than max_area, e.g. slivers between neighbouring features.
+
+    Args:
+        geometries: Array of shapely geometries.
+        max_area: Only smaller gaps are returned.
+        is_valid: Result of check_no_selfintersection, if already computed.
+
+    Returns:
+        One row per gap and adjacent feature with the gap index, the feature index,
+        the area and the polygon of the gap.
+    """
+    geometries = make_valid_where_invalid(geometries, is_valid)
+    union = shapely.union_all(geometries)
+    parts, _ = get_polygon_parts(np.array([union]))
+    rings, ring_part_index = shapely.get_rings(parts, return_index=True)
+    is_interior = np.r_[False, ring_part_index[1:] == ring_part_index[:-1]]
+    gaps = shapely.polygons(rings[is_interior])
+    area = shapely.area(gaps)
+    gaps, area = gaps[area < max_area], area[area < max_area]
+    gap_index, feature = shapely.STRtree(geometries).query(
+        gaps, predicate="intersects"
+    )
+    return pd.DataFrame(
+        {
+            "gap": gap_index,
+            "feature": feature,
+            "area": area[gap_index],
+            "geometry": gaps[gap_index],
+        }
+    )
+
+
+def check_no_overlaps(
+    geometries: np.ndarray,
+    gap_area: float = 0.0,
+    is_valid: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    is_valid_feature = np.ones(len(geometries), dtype=bool)
+    if len(geometries) < 2:
+        return is_valid_feature
+    overlaps = find_overlaps(geometries)
+    is_valid_feature[overlaps["feature"].to_numpy()] = False
+    is_valid_feature[overlaps["other"].to_numpy()] = False
+    if gap_area > 0:
+        gaps = find_gaps(geometries, gap_area, is_valid)
+        is_valid_feature[gaps["feature"].to_numpy()] = False
+    return is_valid_feature
+
+
+def is_wgs84(crs) -> bool:
+    """
+    True for EPSG:4326 in either axis order (e.g. OGC:CRS84). A missing crs is
+    assumed to be WGS84, as in GeoJSON.
+    """
+    return crs is None or CRS.from_user_input(crs).equals(
+        "EPSG:4326", ignore_axis_order=True
+    )
+
+
+def check_wgs84(geometries: np.ndarray, crs=None) -> np.ndarray:
+    """
+    Valid if the crs is WGS84 and all coordinates are within the longitude/latitude
+    bounds, see RFC 7946.
+    """
+    if not is_wgs84(crs):
+        return np.zeros(len(geometries), dtype=bool)
+    xmin, ymin, xmax, ymax = shapely.bounds(geometries).T
+    # Empty and missing geometries have NaN bounds and are valid.
+    return ~(
+        (xmin < WGS84_BOUNDS[0])
+        | (ymin < WGS84_BOUNDS[1])
+        | (xmax > WGS84_BOUNDS[2])
+        | (ymax > WGS84_BOUNDS[3])
+    )
+
+
+def run_feature_checks(
+    geometries: np.ndarray,
+    duplicated_vertices_tolerance: float = 0.0,
+    gap_area: float = 0.0,
+    inter_feature: bool = True,
+    crs=None,
+    grid_size: Optional[float] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Runs all checks in batch over the geometry array.
+
+    Args:
+        geometries: Array of shapely geometries.
+        duplicated_vertices_tolerance: Snapping tolerance for near-duplicated
+            vertices, 0 only considers exact duplicates.
+        gap_area: Gaps between the features smaller than this area fail the
+            "No Overlaps" check as well, 0 only checks the overlaps.
+        inter_feature: Also run the checks of INTER_FEATURE_CRITERIA.
+        crs: Coordinate reference system of the geometries.
+        grid_size: Grid of the "Coordinate Precision" check, defaults to the grid of
+            the crs, see grid_size_for_crs.
+
+    Returns:
+        Per validation criteria a boolean array, True for the valid features.
+    """
+    if grid_size is None:
+        grid_size = grid_size_for_crs(crs)
+    parts, part_index = get_polygon_parts(geometries)
+    is_valid = check_no_selfintersection(geometries)
+    feature_checks = {
+        "No Self-Intersection": is_valid,
+        "No Holes": check_no_holes(geometries, parts, part_index),
+        "Counterclockwise": check_ccw(geometries, parts, part_index),
+        "No Duplicated Vertices": check_no_duplicated_vertices(
+            geometries, duplicated_vertices_tolerance
+        ),
+        "WGS84 / RFC 7946": check_wgs84(geometries, crs),
+        "Coordinate Precision": check_coordinate_precision(geometries, grid_size),
+    }
+    if inter_feature:
+        feature_checks["No Overlaps"] = check_no_overlaps(
+            geometries, gap_area, is_valid
+        )
+    return feature_checks
+
+
+def feature_report(
+    geometries: np.ndarray,
+    feature_checks: Dict[str, np.ndarray],
+    validation_criteria: List[str],
+) -> pd.DataFrame:
+    """
+    Report of the features that fail any of the validation criteria. The validity
+    reasons are computed in one batch over the failing features only.
+
+    Args:
+        geometries: Array of shapely geometries.
+        feature_checks: The per-feature check results, see run_feature_checks.
+        validation_criteria: The list of selected validation criteria.
+
+    Returns:
+        One row per failing feature with the feature index, the failed criteria
+        (comma separated), the validity reason of shapely.is_valid_reason and the
+        x, y location of the reason if it has one.
+    """
+    criteria = [c for c in feature_checks if c in validation_criteria]
+    is_failed = np.zeros((len(geometries), len(criteria)), dtype=bool)
+    for i, c in enumerate(criteria):
+        is_failed[:, i] = ~feature_checks[c]
+    feature = np.flatnonzero(is_failed.any(axis=1))
+
+    # The combination of failed criteria as bits, one label per distinct combination.
+    codes = is_failed[feature] @ (1 << np.arange(len(criteria)))
+    labels = {
+        code: ", ".join(c for i, c in enumerate(criteria) if code >> i & 1)
+        for code in np.unique(codes).tolist()
+    }
+    reason = pd.Series(shapely.is_valid_reason(geometries[feature]), dtype=object)
+    location = reason.str.extract(r"\[(\S+) (\S+)\]").astype(float)
+    return pd.DataFrame(
+        {
+            "feature": feature,
+            "failed": pd.Series(codes).map(labels).astype("category"),
+            "reason": reason,
+            "x": location[0].to_numpy(),
+            "y": location[1].to_numpy(),
+        }
+    )
 
 
 class Vector:
@@ -18,8 +696,16 @@ class Vector:
         is_no_holes=None,
         is_ccw=None,
         is_no_duplicated_vertices=None,
+        is_no_overlaps=None,
+        is_4326=None,
+        is_precise=None,
+        duplicated_vertices_tolerance: float = 0.0,
+        gap_area: float = 0.0,
     ):
         self.df = df
+        # Parameters of the checks, kept for the re-checks after fixes.
+        self.duplicated_vertices_tolerance = duplicated_vertices_tolerance
+        self.gap_area = gap_area
         self.valid_by_citeria = False
         self.valid_all = False
         self.is_single_ring = False
@@ -27,48 +713,108 @@ class Vector:
         self.is_no_holes = False
         self.is_ccw = False
         self.is_no_duplicated_vertices = False
+        self.is_no_overlaps = False
+        self.is_4326 = False
+        self.is_precise = False
+        self.feature_checks: Dict[str, np.ndarray] = {}
+
+    @property
+    def geometries(self) -> np.ndarray:
+        return np.asarray(self.df.geometry.values)
 
     def run_validation_checks(
-        self, validation_criteria: Union[List[str], None]
+        self,
+        validation_criteria: Union[List[str], None],
+        duplicated_vertices_tolerance: float = 0.0,
+        gap_area: float = 0.0,
+    ) -> None:
+        """
+        Checks all validity conditions. The per-feature results are stored in
+        feature_checks, the dataset-wide is_* flags are derived from them. The
+        inter-feature checks only run if selected, as they cover all features.
+        """
+        self.duplicated_vertices_tolerance = duplicated_vertices_tolerance
+        self.gap_area = gap_area
+        feature_checks = run_feature_checks(
+            self.geometries,
+            duplicated_vertices_tolerance,
+            gap_area,
+            inter_feature="No Overlaps" in (validation_criteria or []),
+            crs=self.df.crs,
+        )
+        self.evaluate_feature_checks(feature_checks, validation_criteria)
+
+    def update_feature_checks(
+        self, index: np.ndarray, validation_criteria: Union[List[str], None]
+    ) -> None:
+        """
+        Re-runs the checks only for the features at the given positions and merges
+        them into the existing per-feature results, e.g. after these were fixed.
+        The inter-feature checks are re-run over all features if selected. The
+        checks use the parameters of the previous run.
+        """
+        updated = run_feature_checks(
+            self.geometries[index],
+            self.duplicated_vertices_tolerance,
+            inter_feature=False,
+            crs=self.df.crs,
+        )
+        feature_checks = {}
+        for criteria, is_valid in self.feature_checks.items():
+            if criteria in INTER_FEATURE_CRITERIA:
+                continue
+            # Copy, the existing results can be shared e.g. with the cache.
+            feature_checks[criteria] = is_valid.copy()
+            feature_checks[criteria][index] = updated[criteria]
+        if "No Overlaps" in (validation_criteria or []):
+            feature_checks["No Overlaps"] = check_no_overlaps(
+                self.geometries, self.gap_area, feature_checks["No Self-Intersection"]
+            )
+        self.evaluate_feature_checks(feature_checks, validation_criteria)
+
+    def evaluate_feature_checks(
+        self,
+        feature_checks: Dict[str, np.ndarray],
+        validation_criteria: Union[List[str], None],
     ) -> None:
         """
-        Checks all validity conditions.
+        Derives the dataset-wide flags from already computed per-feature checks.
+        The flags of criteria that were not checked are None, valid_all covers the
+        checked criteria.
         """
-        self.check_is_no_selfintersection()
+        self.feature_checks = feature_checks
+        for criteria, flag in CRITERIA_FLAGS.items():
+            is_valid = self.feature_checks.get(criteria)
+            setattr(self, flag, None if is_valid is None else bool(is_valid.all()))
         self.check_is_single_ring()
-        self.check_is_no_holes()
-        self.check_is_ccw()
-        self.check_is_no_duplicated_vertices()
 
-        self.valid_all = False
-        if all(
-            [
-                self.is_no_selfintersection,
-                self.is_no_holes,
-                self.is_ccw,
-                self.is_no_duplicated_vertices,
-            ]
-        ):
-            self.valid_all = True
-
-        # TODO: Simplify
-        self.valid_by_citeria = False
-        citeria_count = 0
-        if validation_criteria:
-            if "No Self-Intersection" in validation_criteria:
-                if self.is_no_selfintersection:
-                    citeria_count += 1
-            if "No Holes" in validation_criteria:
-                if self.check_is_no_holes:
-                    citeria_count += 1
-            if "Counterclockwise" in validation_criteria:
-                if self.is_ccw:
-                    citeria_count += 1
-            if "No Duplicated Vertices" in validation_criteria:
-                if self.is_no_duplicated_vertices:
-                    citeria_count += 1
-            if citeria_count == len(validation_criteria):
-                self.valid_by_citeria = True
+        self.valid_all = all(
+            getattr(self, CRITERIA_FLAGS[criteria]) for criteria in self.feature_checks
+        )
+        self.valid_by_citeria = bool(validation_criteria) and all(
+            getattr(self, CRITERIA_FLAGS[criteria]) for criteria in validation_criteria
+        )
+
+    def find_duplicated_vertices(self, tolerance: float = 0.0) -> pd.DataFrame:
+        """
+        The affected features and vertex positions of duplicated vertices.
+        """
+        return find_duplicated_vertices(self.geometries, tolerance)
+
+    def feature_report(self, validation_criteria: List[str]) -> pd.DataFrame:
+        """
+        Report of the features failing any of the validation criteria, see
+        feature_report.
+        """
+        return feature_report(
+            self.geometries, self.feature_checks, validation_criteria
+        )
+
+    def find_overlaps(self) -> pd.DataFrame:
+        """
+        The overlapping feature pairs and their overlap areas.
+        """
+        return find_overlaps(self.geometries)
 
     def check_is_single_feature(self) -> None:
         self.is_single_feature = self.df.shape[0] == 1
@@ -79,43 +825,22 @@ class Vector:
         )
 
     def check_is_single_ring(self) -> None:
-        self.is_single_ring = (
-            len(self.df.iloc[0].geometry.__geo_interface__["coordinates"]) == 1
+        """
+        Every polygonal feature is a Polygon without holes, or a MultiPolygon of one
+        such part. Missing, empty and other geometries are not counted.
+        """
+        geometries = self.geometries
+        parts, part_index = get_polygon_parts(geometries)
+        n_rings = np.bincount(
+            part_index,
+            weights=shapely.get_num_interior_rings(parts) + 1,
+            minlength=self.df.shape[0],
         )
+        is_polygonal = np.isin(
+            shapely.get_type_id(geometries),
+            [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON],
+        ) & ~shapely.is_empty(geometries)
+        self.is_single_ring = bool((n_rings[is_polygonal] == 1).all())
 
     def check_is_4326(self) -> None:
-        self.is_4326 = self.df.crs == "EPSG:4326"
-
-    def check_is_no_selfintersection(self) -> None:
-        self.is_no_selfintersection = all(
-            self.df.geometry.apply(lambda x: x.is_valid).to_list()
-        )
-
-    def check_is_no_holes(self) -> None:
-        if not any(
-            [
-                row.geometry.geom_type == "Polygon" and row.geometry.interiors
-                for _, row in self.df.iterrows()
-            ]
-        ):
-            self.is_no_holes = True
-
-    def check_is_ccw(self) -> None:
-        # TODO: Check interior cw
-        if all(
-            [
-                row.geometry.exterior.is_ccw
-                for _, row in self.df.iterrows()
-                if row.geometry.geom_type == "Polygon"
-            ]
-        ):
-            self.is_ccw = True
-
-    def check_is_no_duplicated_vertices(self) -> None:
-        have_duplicates = []
-        for _, row in self.df.iterrows():
-            # Same first and last coordinate vertices is ignored.
-            coords = list(row.geometry.exterior.coords)[1:-1]
-            have_duplicates.append(len(coords) != len(set(coords)))
-        if not any(have_duplicates):
-            self.is_no_duplicated_vertices = True
+        self.is_4326 = bool(check_wgs84(self.geometries, self.df.crs).all())
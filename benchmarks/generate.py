@@ -0,0 +1,147 @@
+"""
+Deterministic generator of synthetic Polygon/MultiPolygon datasets with controllable
+shares of the invalid cases the app checks for.
+"""
+
+from typing import Optional
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame
+
+
+def _star_rings(
+    rng: np.random.Generator,
+    centers: np.ndarray,
+    radius: np.ndarray,
+    n_vertices: int,
+) -> np.ndarray:
+    """
+    Closed, counterclockwise star-shaped rings around the centers. The rings are
+    simple as the vertices are ordered by angle.
+
+    Returns:
+        Coordinates array of shape (len(centers), n_vertices + 1, 2).
+    """
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radii = radius[:, None] * rng.uniform(0.7, 1.0, size=(len(centers), n_vertices))
+    coords = np.empty((len(centers), n_vertices + 1, 2))
+    coords[:, :-1, 0] = centers[:, :1] + radii * np.cos(angles)
+    coords[:, :-1, 1] = centers[:, 1:] + radii * np.sin(angles)
+    coords[:, -1] = coords[:, 0]
+    return coords
+
+
+def generate_dataset(
+    n_features: int,
+    n_vertices: int = 32,
+    hole_ratio: float = 0.1,
+    selfintersection_ratio: float = 0.05,
+    cw_ratio: float = 0.1,
+    duplicate_ratio: float = 0.05,
+    multipolygon_ratio: float = 0.1,
+    seed: Optional[int] = 0,
+) -> GeoDataFrame:
+    """
+    Generates non-overlapping features on a regular grid in EPSG:4326. The invalid
+    cases are drawn independently per feature and applied to its first part.
+
+    Args:
+        n_features: Number of features.
+        n_vertices: Number of vertices of each exterior ring (min 8).
+        hole_ratio: Share of features with an interior ring.
+        selfintersection_ratio: Share of features with a self-intersecting exterior.
+        cw_ratio: Share of features with a clockwise exterior ring.
+        duplicate_ratio: Share of features with a duplicated vertex.
+        multipolygon_ratio: Share of MultiPolygon features with two parts.
+        seed: Random seed, the same arguments always give the same dataset.
+
+    Returns:
+        Geopandas dataframe with the geometries and an "id" property.
+    """
+    n_vertices = max(8, n_vertices)
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(max(n_features, 1))))
+    spacing = min(1.0, 160 / side)
+    feature = np.arange(n_features)
+    centers = np.stack(
+        [-170 + (feature % side) * spacing, -80 + (feature // side) * spacing], axis=1
+    )
+
+    # MultiPolygons consist of two smaller parts side by side. The parts of all
+    # features come first, followed by the second parts of the MultiPolygons.
+    is_multi = rng.random(n_features) < multipolygon_ratio
+    n_second = int(is_multi.sum())
+    part_centers = np.concatenate([centers, centers[is_multi]])
+    part_centers[:n_features][is_multi, 0] -= spacing * 0.22
+    part_centers[n_features:, 0] += spacing * 0.22
+    part_radius = np.where(np.r_[is_multi, np.ones(n_second, bool)], 0.2, 0.4)
+    part_radius = part_radius * spacing
+    shells = _star_rings(rng, part_centers, part_radius, n_vertices)
+
+    def pick(ratio: float) -> np.ndarray:
+        return np.flatnonzero(rng.random(n_features) < ratio)
+
+    # Swapping a vertex with the opposite one makes the ring cross itself.
+    selfintersecting = pick(selfintersection_ratio)
+    opposite = n_vertices // 2
+    swapped = shells[selfintersecting, 1].copy()
+    shells[selfintersecting, 1] = shells[selfintersecting, opposite]
+    shells[selfintersecting, opposite] = swapped
+    duplicated = pick(duplicate_ratio)
+    shells[duplicated, 3] = shells[duplicated, 2]
+    clockwise = pick(cw_ratio)
+    shells[clockwise] = shells[clockwise, ::-1]
+
+    polygons = shapely.polygons(shells)
+    with_hole = pick(hole_ratio)
+    if len(with_hole):
+        holes = _star_rings(
+            rng,
+            part_centers[with_hole],
+            part_radius[with_hole] * 0.3,
+            max(4, n_vertices // 4),
+        )
+        # Interior rings are clockwise.
+        polygons[with_hole] = shapely.polygons(
+            shapely.linearrings(shells[with_hole]), holes=holes[:, None, ::-1]
+        )
+
+    geometries = polygons[:n_features].copy()
+    if n_second:
+        multi_feature = feature[is_multi]
+        parts = np.stack([polygons[multi_feature], polygons[n_features:]], axis=1)
+        geometries[multi_feature] = shapely.multipolygons(
+            parts.ravel(), indices=np.repeat(np.arange(n_second), 2)
+        )
+
+    return GeoDataFrame({"id": feature}, geometry=geometries, crs="EPSG:4326")
+
+
+def generate_coastline(
+    n_vertices: int, selfintersections: int = 0, seed: Optional[int] = 0
+) -> GeoDataFrame:
+    """
+    Generates a single coastline-like Polygon, a circle with a random walk on the
+    radius, e.g. to benchmark the checks of large geometries.
+
+    Args:
+        n_vertices: Number of vertices of the exterior ring.
+        selfintersections: Number of neighbouring vertex pairs swapped, each makes
+            the ring cross itself.
+        seed: Random seed, the same arguments always give the same polygon.
+
+    Returns:
+        Geopandas dataframe with the single feature.
+    """
+    n_vertices = max(8, n_vertices)
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    walk = np.cumsum(rng.normal(0, 0.002, n_vertices))
+    # Without a trend the walk ends where it started.
+    radius = 10 + walk - np.linspace(0, walk[-1], n_vertices)
+    coords = np.stack([radius * np.cos(angles), radius * np.sin(angles)], axis=1)
+    swapped = rng.choice(np.arange(1, n_vertices - 2), selfintersections, replace=False)
+    coords[[swapped, swapped + 1]] = coords[[swapped + 1, swapped]]
+    polygon = shapely.polygons(np.concatenate([coords, coords[:1]]))
+    return GeoDataFrame({"id": [0]}, geometry=[polygon], crs="EPSG:4326")
@@ -0,0 +1,63 @@
+"""
+Import-time breakdown of the app modules, measured in a fresh interpreter with
+`python -X importtime`. Lists the top-level packages with the most import time.
+
+Example:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules main_header components --top 15
+"""
+
+import argparse
+from pathlib import Path
+import subprocess
+import sys
+from typing import Dict, List
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+HEADER_IMPORTS = "import streamlit, streamlit_lottie, assets, instrumentation"
+
+
+def import_times(statement: str) -> Dict[str, float]:
+    """
+    Import time in seconds per top-level package, e.g. "geopandas", summed over
+    the self time of all its modules.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, _, name = line[len("import time:") :].split("|")
+        package = name.strip().split(".")[0]
+        times[package] = times.get(package, 0.0) + int(self_time) / 1e6
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=["main_header", "components"],
+        help="App modules, main_header is everything the header needs.",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        statement = HEADER_IMPORTS if module == "main_header" else f"import {module}"
+        times = import_times(statement)
+        ranked: List = sorted(times.items(), key=lambda item: -item[1])
+        print(f"{module}: {sum(times.values()):.3f}s")
+        for package, seconds in ranked[: args.top]:
+            print(f"  {package:<24} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Load test of the validation service (app/service.py) with concurrent requests of a
+synthetic dataset. Reports throughput, latency percentiles and rejected (429)
+requests.
+
+Example:
+    uvicorn service:app --app-dir app --port 8000
+    python benchmarks/load_test.py --url http://localhost:8000 --requests 200 --concurrency 32
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from generate import generate_dataset
+
+
+def post(url: str, body: bytes) -> tuple:
+    request = urllib.request.Request(
+        f"{url}/validate", data=body, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--features", type=int, default=1000, help="Per request.")
+    args = parser.parse_args()
+
+    df = generate_dataset(args.features)
+    body = json.dumps({"geojson": df.__geo_interface__, "fix": True}).encode()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(lambda _: post(args.url, body), range(args.requests)))
+    seconds = time.perf_counter() - start
+
+    statuses = [status for status, _ in results]
+    latencies = np.array([latency for status, latency in results if status == 200])
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "features_per_request": args.features,
+        "seconds": round(seconds, 3),
+        "ok": statuses.count(200),
+        "rejected_429": statuses.count(429),
+        "other_errors": len(statuses) - statuses.count(200) - statuses.count(429),
+        "throughput_rps": round(statuses.count(200) / seconds, 2),
+    }
+    if len(latencies):
+        for percentile in (50, 90, 99):
+            report[f"latency_p{percentile}_s"] = round(
+                float(np.percentile(latencies, percentile)), 3
+            )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmarks the pipeline stages (parsing per input format, each check, each fix,
+output serialization) on synthetic datasets of increasing size.
+
+Example:
+    python benchmarks/run.py --tiers small medium --output results.json
+    python benchmarks/run.py --tiers small --compare results.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Any
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import fixes  # noqa: E402
+import utils  # noqa: E402
+import validation  # noqa: E402
+from generate import generate_coastline, generate_dataset  # noqa: E402
+
+
+TIERS = {
+    "tiny": 100,
+    "small": 1_000,
+    "medium": 10_000,
+    "large": 100_000,
+    "xlarge": 1_000_000,
+}
+FILE_FORMATS = ["geojson", "kml", "wkt", "zip", "fgb", "parquet", "arrow"]
+
+
+def time_stage(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Runs the stage repeat times, the minimum is the most stable comparable value.
+    """
+    runs = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"seconds": min(runs), "runs": runs}
+
+
+def write_input_files(df: gpd.GeoDataFrame, directory: Path) -> Dict[str, Path]:
+    """
+    Writes the dataset in every supported upload format.
+    """
+    paths = {}
+    paths["geojson"] = directory / "data.geojson"
+    paths["geojson"].write_bytes(utils.write_df_to_bytes(df, "GeoJSON"))
+    paths["kml"] = directory / "data.kml"
+    df.to_file(paths["kml"], driver="KML")
+    # A WKT file holds a single geometry, all parts are combined into one.
+    paths["wkt"] = directory / "data.wkt"
+    parts = shapely.get_parts(np.asarray(df.geometry.values))
+    paths["wkt"].write_text(shapely.to_wkt(shapely.multipolygons(parts)))
+    shapefile_dir = directory / "shapefile"
+    shapefile_dir.mkdir()
+    df.to_file(shapefile_dir / "data.shp")
+    paths["zip"] = directory / "data.zip"
+    with zipfile.ZipFile(paths["zip"], "w") as z:
+        for file in shapefile_dir.iterdir():
+            z.write(file, file.name)
+    paths["fgb"] = directory / "data.fgb"
+    df.to_file(paths["fgb"], driver="FlatGeobuf")
+    paths["parquet"] = directory / "data.parquet"
+    df.to_parquet(paths["parquet"])
+    paths["arrow"] = directory / "data.arrow"
+    df.to_feather(paths["arrow"])
+    return paths
+
+
+def read_file(path: Path) -> gpd.GeoDataFrame:
+    with open(path, "rb") as f:
+        return utils.read_vector_file_to_df(f)
+
+
+def benchmark_tier(
+    tier: str, n_features: int, n_vertices: int, repeat: int
+) -> List[Dict[str, Any]]:
+    df = generate_dataset(n_features, n_vertices=n_vertices)
+    geometries = np.asarray(df.geometry.values)
+    meta = {
+        "tier": tier,
+        "features": n_features,
+        "vertices": int(shapely.get_num_coordinates(geometries).sum()),
+    }
+    stages: Dict[str, Callable[[], Any]] = {}
+
+    with TemporaryDirectory() as tmpdir:
+        paths = write_input_files(df, Path(tmpdir))
+        for file_format in FILE_FORMATS:
+            stages[f"parse/{file_format}"] = lambda p=paths[file_format]: read_file(p)
+        json_string = paths["geojson"].read_text()
+        stages["parse/pasted json"] = lambda: utils.read_json_string_to_df(
+            json_string
+        )
+
+        parts, part_index = validation.get_polygon_parts(geometries)
+        stages["check/No Self-Intersection"] = (
+            lambda: validation.check_no_selfintersection(geometries)
+        )
+        stages["check/No Holes"] = lambda: validation.check_no_holes(
+            geometries, parts, part_index
+        )
+        stages["check/Counterclockwise"] = lambda: validation.check_ccw(
+            geometries, parts, part_index
+        )
+        stages["check/No Duplicated Vertices"] = (
+            lambda: validation.check_no_duplicated_vertices(geometries)
+        )
+        stages["check/No Overlaps"] = lambda: validation.check_no_overlaps(geometries)
+        stages["check/WGS84 / RFC 7946"] = lambda: validation.check_wgs84(
+            geometries, df.crs
+        )
+        stages["check/Coordinate Precision"] = (
+            lambda: validation.check_coordinate_precision(geometries)
+        )
+        for criteria in fixes.FIX_MESSAGES:
+            if criteria in validation.INTER_FEATURE_CRITERIA + ["WGS84 / RFC 7946"]:
+                continue
+            stages[f"fix/{criteria}"] = lambda c=criteria: fixes.repair_geometries(
+                geometries, [c]
+            )
+        stages["fix/No Overlaps"] = lambda: fixes.remove_overlaps(geometries)
+        projected = df.set_crs(3857, allow_override=True)
+        stages["fix/WGS84 / RFC 7946"] = lambda: utils.to_wgs84(projected)
+        stages["output/GeoJSON"] = lambda: utils.write_df_to_bytes(df, "GeoJSON")
+
+        results = []
+        for stage, func in stages.items():
+            result = {**meta, "stage": stage, **time_stage(func, repeat)}
+            print(
+                f"{tier:>7} {stage:<32} "
+                + (f"{result['seconds']:.4f}s" if "seconds" in result else "error"),
+                file=sys.stderr,
+            )
+            results.append(result)
+    return results
+
+
+def benchmark_large_geometry(n_vertices: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    The checks and repair of a single large Polygon, whole and on the pieces of a
+    grid.
+    """
+    results = []
+    for name, selfintersections in [("valid", 0), ("invalid", 100)]:
+        geometries = np.asarray(
+            generate_coastline(n_vertices, selfintersections).geometry.values
+        )
+        stages: Dict[str, Callable[[], Any]] = {
+            "check/No Self-Intersection": lambda: shapely.is_valid(geometries),
+            "check/No Self-Intersection (grid)": (
+                lambda: validation.is_valid_by_grid(geometries[0])
+            ),
+            "fix/No Self-Intersection": lambda: fixes.repair_geometries(
+                geometries, ["No Self-Intersection"]
+            ),
+        }
+        for stage, func in stages.items():
+            result = {
+                "tier": f"geometry/{name}",
+                "features": 1,
+                "vertices": n_vertices,
+                "stage": stage,
+                **time_stage(func, repeat),
+            }
+            print(
+                f"{name:>7} {stage:<32} "
+                + (f"{result['seconds']:.4f}s" if "seconds" in result else "error"),
+                file=sys.stderr,
+            )
+            results.append(result)
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict]) -> None:
+    """
+    Prints the time ratio per tier and stage against a previous results file.
+    """
+    previous = {(r["tier"], r["stage"]): r.get("seconds") for r in baseline}
+    for result in results:
+        before = previous.get((result["tier"], result["stage"]))
+        now = result.get("seconds")
+        if before and now:
+            print(f"{result['tier']:>7} {result['stage']:<32} {now / before:6.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--tiers", nargs="+", choices=list(TIERS), default=["tiny", "small", "medium"]
+    )
+    parser.add_argument("--vertices", type=int, default=32, help="Vertices per ring.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage.")
+    parser.add_argument("--output", type=Path, help="Write the results JSON here.")
+    parser.add_argument("--compare", type=Path, help="Previous results JSON.")
+    parser.add_argument(
+        "--large-geometry",
+        type=int,
+        metavar="VERTICES",
+        help="Also benchmark a single Polygon with this many vertices.",
+    )
+    args = parser.parse_args()
+
+    results = []
+    for tier in args.tiers:
+        results += benchmark_tier(tier, TIERS[tier], args.vertices, args.repeat)
+    if args.large_geometry:
+        results += benchmark_large_geometry(args.large_geometry, args.repeat)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "shapely": shapely.__version__,
+            "geopandas": gpd.__version__,
+            "numpy": np.__version__,
+            "vertices": args.vertices,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text())["results"])
+
+
+if __name__ == "__main__":
+    main()
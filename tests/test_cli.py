@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+
+from cli import output_paths, process_file
+
+
+def test_output_paths_are_unique(tmp_path):
+    paths = [
+        tmp_path / "a" / "x.geojson",
+        tmp_path / "b" / "x.geojson",
+        tmp_path / "a" / "y.geojson",
+        tmp_path / "a" / "y.zip",
+    ]
+    assert output_paths(paths, Path("out")) == [
+        Path("out/a/x.geojson"),
+        Path("out/b/x.geojson"),
+        Path("out/a/y.geojson.geojson"),
+        Path("out/a/y.zip.geojson"),
+    ]
+
+
+def test_output_paths_keep_the_stem(tmp_path):
+    paths = [tmp_path / "x.geojson", tmp_path / "y.zip"]
+    assert output_paths(paths, Path("out")) == [
+        Path("out/x.geojson"),
+        Path("out/y.geojson"),
+    ]
+
+
+def test_output_paths_refuse_duplicates(tmp_path):
+    with pytest.raises(ValueError):
+        output_paths([tmp_path / "x.geojson", tmp_path / "x.geojson"], Path("out"))
+
+
+def test_no_overlaps_in_chunks_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        process_file(
+            tmp_path / "x.geojson", tmp_path / "out.geojson", ["No Overlaps"], 2
+        )
@@ -0,0 +1,46 @@
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import box
+
+import fixes
+from validation import Vector
+
+# Two features with a small gap in between, enclosed by two more features.
+GAP = [box(0, 0, 1, 2), box(1.01, 0, 2, 2), box(0, 2, 2, 3), box(0, -1, 2, 0)]
+
+
+def test_gap_area_is_kept_for_the_recheck():
+    vector = Vector(gpd.GeoDataFrame(geometry=GAP))
+    vector.run_validation_checks(["No Overlaps"], gap_area=0.1)
+    assert not vector.feature_checks["No Overlaps"].any()
+
+    # A re-check of unrelated features still finds the gap.
+    vector.update_feature_checks(np.array([0]), ["No Overlaps"])
+    assert not vector.valid_by_citeria
+
+
+def test_fill_gaps():
+    vector = Vector(gpd.GeoDataFrame(geometry=GAP))
+    vector.run_validation_checks(["No Overlaps", "Counterclockwise"], gap_area=0.1)
+    fixes.fix(vector, ["No Overlaps", "Counterclockwise"])
+    assert vector.valid_by_citeria
+    # The gap goes to the first adjacent feature.
+    np.testing.assert_allclose(vector.df.area, [2.02, 1.98, 2, 2])
+
+
+def test_gaps_above_gap_area_are_valid():
+    vector = Vector(gpd.GeoDataFrame(geometry=GAP))
+    vector.run_validation_checks(["No Overlaps"], gap_area=0.01)
+    assert vector.valid_by_citeria
+
+
+def test_duplicated_vertices_tolerance_is_kept_for_the_recheck():
+    near_duplicate = box(0, 0, 1, 1).union(box(0.5, 0.5, 1.000001, 1.000001))
+    vector = Vector(gpd.GeoDataFrame(geometry=[near_duplicate, box(2, 2, 3, 3)]))
+    vector.run_validation_checks(
+        ["No Duplicated Vertices"], duplicated_vertices_tolerance=0.001
+    )
+    assert not vector.feature_checks["No Duplicated Vertices"][0]
+
+    vector.update_feature_checks(np.array([0]), ["No Duplicated Vertices"])
+    assert not vector.feature_checks["No Duplicated Vertices"][0]
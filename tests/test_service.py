@@ -0,0 +1,73 @@
+"""
+Tests of the service endpoints. The worker pool uses spawn, so the workers import
+the app modules by themselves.
+"""
+
+import json
+import multiprocessing
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from service import InputError, create_app, process_input
+from validation import Vector
+
+POLYGON = {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 0]]]}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(create_app(workers=1, max_queue=4)) as client:
+        yield client
+
+
+def test_validate(client):
+    response = client.post("/validate", json={"geojson": POLYGON, "fix": "false"})
+    assert response.status_code == 200
+    assert response.json()["valid"]
+    assert response.json()["fixes"] == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"geojson": {"type": "FeatureCollection"}},
+        {"geojson": {"type": "MultiPolygon", "coordinates": [[]]}},
+        {"geojson": {"type": "LineString", "coordinates": [[0, 0]]}},
+        {"geojson": POLYGON, "criteria": "Counterclockwise"},
+        {"geojson": POLYGON, "criteria": ["Unknown"]},
+        {"geojson": POLYGON, "fix": "maybe"},
+    ],
+)
+def test_invalid_requests(client, body):
+    response = client.post("/validate", json=body)
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+
+def test_invalid_file_upload(client):
+    response = client.post("/validate", files={"file": ("input.gpkg", b"not a file")})
+    assert response.status_code == 400
+
+
+def test_crashed_worker_replaces_pool(client):
+    assert client.post("/validate", json={"geojson": POLYGON}).status_code == 200
+    for process in multiprocessing.active_children():
+        process.kill()
+        process.join()
+    time.sleep(0.5)
+    assert client.post("/validate", json={"geojson": POLYGON}).status_code == 500
+    assert client.post("/validate", json={"geojson": POLYGON}).status_code == 200
+
+
+def test_check_errors_are_not_input_errors(monkeypatch):
+    def failing_checks(*args, **kwargs):
+        raise KeyError("bug")
+
+    monkeypatch.setattr(Vector, "run_validation_checks", failing_checks)
+    data = json.dumps(POLYGON).encode()
+    with pytest.raises(KeyError):
+        process_input(data, None, ["No Holes"], fix=False)
+    with pytest.raises(InputError):
+        process_input(b"[[]", None, ["No Holes"], fix=False)
@@ -0,0 +1,96 @@
+"""
+Regression tests of the GeoJSON parsing, in particular of the malformed coordinates
+that must not reach shapely.from_ragged_array.
+"""
+
+import orjson
+import pytest
+import shapely
+
+from utils import geometries_from_geojson, read_json_string_to_df, write_df_to_bytes
+
+RING = [[0, 0], [1, 0], [1, 1], [0, 0]]
+RING_2 = [[2, 0], [3, 0], [3, 1], [2, 0]]
+
+
+@pytest.mark.parametrize(
+    "geometry",
+    [
+        {"type": "MultiPolygon", "coordinates": [[]]},
+        {"type": "MultiPolygon", "coordinates": [[RING], []]},
+        {"type": "Polygon", "coordinates": [RING, []]},
+        {"type": "Polygon", "coordinates": [RING[:3]]},
+        {"type": "MultiLineString", "coordinates": [[[0, 0], [1, 1]], []]},
+        {"type": "LineString", "coordinates": [[0, 0]]},
+        {"type": "Polygon"},
+        {"coordinates": [RING]},
+    ],
+)
+def test_malformed_geometries_raise_value_error(geometry):
+    with pytest.raises(ValueError):
+        geometries_from_geojson([geometry])
+    # Also next to a valid geometry of the same type, which is converted in bulk.
+    with pytest.raises(ValueError):
+        geometries_from_geojson([{"type": "Polygon", "coordinates": [RING]}, geometry])
+
+
+@pytest.mark.parametrize(
+    "geometry_type", ["MultiPoint", "LineString", "Polygon", "MultiPolygon"]
+)
+def test_empty_geometries(geometry_type):
+    geometries = geometries_from_geojson(
+        [{"type": geometry_type, "coordinates": []}, None]
+    )
+    assert shapely.is_empty(geometries[0])
+    assert geometries[0].geom_type == geometry_type
+    assert geometries[1] is None
+
+
+def test_bulk_conversion():
+    geometries = geometries_from_geojson(
+        [
+            {"type": "Polygon", "coordinates": [RING]},
+            {"type": "MultiPolygon", "coordinates": [[RING], [RING_2]]},
+            {"type": "Point", "coordinates": [1, 2]},
+            {"type": "LineString", "coordinates": [[0, 0, 1], [1, 1, 1]]},
+        ]
+    )
+    assert shapely.is_valid(geometries).all()
+    assert shapely.get_num_geometries(geometries[1]) == 2
+    assert shapely.has_z(geometries[3])
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"type": "FeatureCollection"},
+        {"type": "FeatureCollection", "features": "abc"},
+        {"type": "FeatureCollection", "features": [1]},
+        [[]],
+        [[[]]],
+        [],
+        {
+            "type": "FeatureCollection",
+            "features": [{"geometry": {"type": "MultiPolygon", "coordinates": [[]]}}],
+        },
+    ],
+)
+def test_malformed_json_raises_value_error(payload):
+    with pytest.raises(ValueError):
+        read_json_string_to_df(orjson.dumps(payload).decode())
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"type": "Polygon", "coordinates": [RING]},
+        [0, 0, 1, 1],
+        {"type": "FeatureCollection", "features": [{"geometry": None}]},
+    ],
+)
+def test_write_geometry_only_frame(payload):
+    df = read_json_string_to_df(orjson.dumps(payload).decode())
+    assert list(df.columns) == ["geometry"]
+    features = orjson.loads(write_df_to_bytes(df, "GeoJSON"))["features"]
+    assert len(features) == 1
+    assert features[0]["properties"] == {}
@@ -0,0 +1,81 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import box
+
+import fixes
+from validation import (
+    VALIDATION_CRITERIA,
+    Vector,
+    check_coordinate_precision,
+    run_feature_checks,
+)
+
+
+def test_missing_geometries_are_valid():
+    geometries = np.array([box(0, 0, 1, 1), None, shapely.Polygon()], dtype=object)
+    for criteria, is_valid in run_feature_checks(geometries).items():
+        assert is_valid.all(), criteria
+
+
+def test_missing_geometries_do_not_block_the_fix():
+    bowtie = shapely.Polygon([(0, 0), (1, 1), (1, 0), (0, 1), (0, 0)])
+    vector = Vector(gpd.GeoDataFrame(geometry=[bowtie, None]))
+    vector.run_validation_checks(VALIDATION_CRITERIA)
+    assert vector.feature_checks["No Self-Intersection"].tolist() == [False, True]
+    fixes.fix(vector, VALIDATION_CRITERIA)
+    assert vector.valid_by_citeria
+    assert vector.df.geometry.values[1] is None
+
+
+def test_overlaps_only_checked_if_selected():
+    overlapping = gpd.GeoDataFrame(geometry=[box(0, 0, 2, 2), box(1, 1, 3, 3)])
+    vector = Vector(overlapping)
+    vector.run_validation_checks(["No Holes"])
+    assert "No Overlaps" not in vector.feature_checks
+    assert vector.is_no_overlaps is None
+    assert vector.valid_by_citeria and vector.valid_all
+
+    vector.run_validation_checks(["No Holes", "No Overlaps"])
+    assert not vector.is_no_overlaps
+    vector.update_feature_checks(np.array([0]), ["No Holes", "No Overlaps"])
+    assert not vector.is_no_overlaps
+
+
+def test_snapped_projected_coordinates_are_precise():
+    polygon = shapely.Polygon(
+        [
+            (500000.123456, 5000000.98765),
+            (500100.55555, 5000000.1111),
+            (500100.3, 5000100.7),
+        ]
+    )
+    vector = Vector(gpd.GeoDataFrame(geometry=[polygon], crs=32632))
+    vector.run_validation_checks(["Coordinate Precision"])
+    assert not vector.is_precise
+    fixes.fix(vector, ["Coordinate Precision"])
+    assert vector.is_precise
+    # Snapped to the 1 cm grid of the projected crs.
+    assert shapely.get_coordinates(vector.geometries)[0].tolist() == [
+        500000.12,
+        5000000.99,
+    ]
+
+
+def test_fine_grid_at_large_coordinates():
+    # Half a grid cell off at a magnitude of 5e6.
+    polygon = np.array([box(5e6 + 0.12345675, 5e6, 5e6 + 1, 5e6 + 1)], dtype=object)
+    snapped = shapely.set_precision(polygon, 1e-7, mode="pointwise")
+    assert not check_coordinate_precision(polygon, 1e-7)[0]
+    assert check_coordinate_precision(snapped, 1e-7)[0]
+
+
+def test_single_ring_ignores_non_polygonal_features():
+    geometries = [box(0, 0, 1, 1), None, shapely.Point(5, 5), shapely.Polygon()]
+    vector = Vector(gpd.GeoDataFrame(geometry=geometries))
+    vector.run_validation_checks(["No Holes"])
+    assert vector.is_single_ring
+
+    vector = Vector(gpd.GeoDataFrame(geometry=[box(0, 0, 1, 1).union(box(2, 2, 3, 3))]))
+    vector.run_validation_checks(["No Holes"])
+    assert not vector.is_single_ring